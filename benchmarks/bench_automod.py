@@ -0,0 +1,95 @@
+"""Per-message cost of the automod pipeline
+
+Builds messages from many members across the fake guild's channels, a mix
+of normal chatter, repeats, links and banned words, and times
+automod_check on each. Then runs the same messages through the full
+on_message listener (actions go to the fake API with no latency).
+
+    python benchmarks/bench_automod.py --messages 100000 --banned-words 500
+"""
+import argparse
+import asyncio
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bot  # noqa: E402
+from fake_discord import FakeDiscord  # noqa: E402
+
+def random_word(length):
+    return ''.join(random.choices(string.ascii_lowercase, k=length))
+
+def build_messages(fake, count, banned_words):
+    chatter = [' '.join(random_word(random.randint(2, 8)) for _ in range(random.randint(3, 25))) for _ in range(2000)]
+    contents = []
+    for _ in range(count):
+        roll = random.random()
+        if roll < 0.02:
+            contents.append(f"check this out https://{random_word(8)}.com/{random_word(5)}")
+        elif roll < 0.04:
+            contents.append(f"{random.choice(chatter)} {random.choice(banned_words)}")
+        elif roll < 0.10:
+            contents.append("join my server for free nitro")
+        else:
+            contents.append(random.choice(chatter))
+    
+    return [
+        fake.message(content, author_id=random.choice(fake.member_ids))
+        for content in contents
+    ]
+
+async def run(args):
+    random.seed(args.seed)
+    fake = FakeDiscord(bot.bot, members=args.members, channels=args.channels, latency=0, jitter=0)
+    guild = await fake.start()
+    
+    state = bot.get_guild_state(guild.id)
+    banned_words = [random_word(random.randint(4, 10)) for _ in range(args.banned_words)]
+    state.automod.banned_words.update(banned_words)
+    state.automod.block_links = True
+    state.automod.enabled = True
+    state.save_automod()
+    
+    messages = build_messages(fake, args.messages, banned_words)
+    
+    # Detection only, spread over simulated time at the target message rate
+    hits = {}
+    step = 1 / args.rate
+    now = time.monotonic()
+    started = time.perf_counter()
+    for message in messages:
+        now += step
+        hit = bot.automod_check(state.automod, message, now)
+        if hit:
+            hits[hit[0]] = hits.get(hit[0], 0) + 1
+    elapsed = time.perf_counter() - started
+    print(f"automod_check: {len(messages)} messages in {elapsed:.2f}s, "
+          f"{len(messages) / elapsed:.0f} msg/s, {elapsed / len(messages) * 1e6:.1f} µs/msg")
+    print(f"hits: {hits}")
+    
+    # Full listener path, including permission checks and actions
+    bot.user_activity.clear()
+    bot.channel_activity.clear()
+    started = time.perf_counter()
+    for message in messages:
+        await bot.automod_on_message(message)
+    elapsed = time.perf_counter() - started
+    print(f"on_message: {len(messages)} messages in {elapsed:.2f}s, "
+          f"{len(messages) / elapsed:.0f} msg/s, {fake.http.requests} API requests")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=50000)
+    parser.add_argument('--members', type=int, default=20000)
+    parser.add_argument('--channels', type=int, default=300)
+    parser.add_argument('--banned-words', type=int, default=500)
+    parser.add_argument('--rate', type=float, default=1000, help='simulated messages per second')
+    parser.add_argument('--seed', type=int, default=0)
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == '__main__':
+    main()
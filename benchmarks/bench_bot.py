@@ -0,0 +1,179 @@
+"""Offline load test for bot.py
+
+Drives simulated ?warn, ?ban, ?modlogs, ?temprole and ?lockall invocations
+through bot.process_commands against the fake Discord in fake_discord.py,
+then reports throughput, latency percentiles and peak memory.
+
+    python benchmarks/bench_bot.py --invocations 5000 --latency 0.05
+
+Use --json to save the results and --max-p99-ms to fail (exit 1) when any
+command's p99 latency goes over a budget, e.g. in CI.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bot  # noqa: E402
+from fake_discord import FakeDiscord  # noqa: E402
+
+# Relative weight of each command in the simulated workload
+WORKLOAD = {
+    'warn': 40,
+    'modlogs': 30,
+    'ban': 15,
+    'temprole': 10,
+    'lockall': 5,
+}
+
+def percentile(samples, q):
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(int(q * len(samples)), len(samples) - 1)]
+
+def build_invocations(fake, count, offenders):
+    """Pick (command, content) pairs, targeting a small pool of users so histories grow"""
+    names = list(WORKLOAD)
+    weights = [WORKLOAD[name] for name in names]
+    targets = fake.member_ids[:offenders]
+    
+    invocations = []
+    for name in random.choices(names, weights, k=count):
+        target = random.choice(targets)
+        if name == 'warn':
+            content = f'?warn <@{target}> spamming in chat'
+        elif name == 'ban':
+            content = f'?ban <@{target}> raid account'
+        elif name == 'modlogs':
+            content = f'?modlogs <@{target}>'
+        elif name == 'temprole':
+            content = f'?temprole <@{target}> <@&{random.choice(fake.role_ids[:-1])}> 10m'
+        else:
+            content = '?lockall'
+        invocations.append((name, content))
+    return invocations
+
+async def run(args):
+    random.seed(args.seed)
+    db_dir = tempfile.mkdtemp(prefix='modbot-bench-')
+    bot.DATA_FILE = os.path.join(db_dir, 'bench.db')
+    bot.load_data()
+    
+    fake = FakeDiscord(
+        bot.bot,
+        members=args.members,
+        channels=args.channels,
+        latency=args.latency,
+        jitter=args.jitter,
+        rate_limit_chance=args.rate_limit_chance,
+        retry_after=args.retry_after,
+    )
+    await fake.start()
+    bot.instrument_http(bot.bot.http)
+    await bot.load_extensions()
+    background = [asyncio.create_task(bot.data_flush_handler()), asyncio.create_task(bot.loop_lag_monitor())]
+    
+    invocations = build_invocations(fake, args.invocations, args.offenders)
+    samples = defaultdict(list)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    
+    async def invoke(name, content):
+        message = fake.message(content)
+        async with semaphore:
+            started = time.perf_counter()
+            await bot.bot.process_commands(message)
+            samples[name].append(time.perf_counter() - started)
+    
+    if args.memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    await asyncio.gather(*(invoke(name, content) for name, content in invocations))
+    elapsed = time.perf_counter() - started
+    peak_memory = tracemalloc.get_traced_memory()[1] if args.memory else None
+    if args.memory:
+        tracemalloc.stop()
+    
+    for task in background:
+        task.cancel()
+    bot.save_data()
+    
+    commands = {}
+    for name, timings in sorted(samples.items()):
+        perf = bot.command_perf.get(name)
+        commands[name] = {
+            'count': len(timings),
+            'errors': perf.errors if perf else 0,
+            'p50_ms': percentile(timings, 0.50) * 1000,
+            'p95_ms': percentile(timings, 0.95) * 1000,
+            'p99_ms': percentile(timings, 0.99) * 1000,
+            'api_avg_ms': perf.api.total / max(perf.api.count, 1) * 1000 if perf else 0.0,
+        }
+    
+    return {
+        'invocations': args.invocations,
+        'elapsed_s': elapsed,
+        'throughput_per_s': args.invocations / elapsed,
+        'api_requests': fake.http.requests,
+        'rate_limited': fake.http.rate_limited,
+        'peak_traced_mb': peak_memory / 1024 / 1024 if peak_memory is not None else None,
+        'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'loop_lag_p99_ms': bot.loop_lag.percentile(0.99) * 1000,
+        'commands': commands,
+    }
+
+def print_report(results):
+    print(f"{results['invocations']} invocations in {results['elapsed_s']:.2f}s "
+          f"({results['throughput_per_s']:.0f}/s), {results['api_requests']} API requests, "
+          f"{results['rate_limited']} rate limited")
+    memory = f"max RSS {results['max_rss_mb']:.1f} MB"
+    if results['peak_traced_mb'] is not None:
+        memory = f"peak traced {results['peak_traced_mb']:.1f} MB, " + memory
+    print(memory)
+    print()
+    print(f"{'command':<10} {'count':>6} {'errors':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'api ms':>8}")
+    for name, stats in results['commands'].items():
+        print(f"{name:<10} {stats['count']:>6} {stats['errors']:>6} {stats['p50_ms']:>8.1f} "
+              f"{stats['p95_ms']:>8.1f} {stats['p99_ms']:>8.1f} {stats['api_avg_ms']:>8.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--invocations', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=50, help='invocations in flight at once')
+    parser.add_argument('--members', type=int, default=5000)
+    parser.add_argument('--channels', type=int, default=50)
+    parser.add_argument('--offenders', type=int, default=200, help='users the commands target')
+    parser.add_argument('--latency', type=float, default=0.05, help='simulated API latency in seconds')
+    parser.add_argument('--jitter', type=float, default=0.02)
+    parser.add_argument('--rate-limit-chance', type=float, default=0.0, help='share of requests answered with 429')
+    parser.add_argument('--retry-after', type=float, default=1.0)
+    parser.add_argument('--memory', action='store_true', help='trace peak Python memory (slower)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='write results to this file')
+    parser.add_argument('--max-p99-ms', type=float, help='exit 1 if any command p99 exceeds this')
+    args = parser.parse_args()
+    
+    results = asyncio.run(run(args))
+    print_report(results)
+    
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    
+    if args.max_p99_ms is not None:
+        slow = [name for name, stats in results['commands'].items() if stats['p99_ms'] > args.max_p99_ms]
+        if slow:
+            print(f"\np99 over {args.max_p99_ms:.0f}ms: {', '.join(slow)}")
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
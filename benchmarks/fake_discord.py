@@ -0,0 +1,207 @@
+"""Local stand-in for Discord used by the benchmarks
+
+FakeDiscord feeds gateway-style payloads for a guild (roles, channels and
+members) into the bot's connection state, so commands run against real
+discord.py Guild, Member and TextChannel objects without a connection.
+FakeHTTP replaces the REST client: every request is answered in-process
+after a configurable latency, and a share of them can be answered with a
+429 that is waited out and retried like discord.py does.
+"""
+import asyncio
+import itertools
+import logging
+import random
+from datetime import datetime, timezone
+
+import discord
+
+http_log = logging.getLogger('discord.http')
+
+BASE_ID = 10 ** 17  # Keeps fake IDs in the snowflake length converters accept
+
+def _timestamp():
+    return datetime.now(timezone.utc).isoformat()
+
+def user_payload(user_id, name, bot=False):
+    return {
+        'id': str(user_id),
+        'username': name,
+        'discriminator': '0',
+        'global_name': None,
+        'avatar': None,
+        'bot': bot,
+    }
+
+class FakeHTTP:
+    """Answers Discord API requests in-process"""
+    
+    def __init__(self, fake, latency=0.05, jitter=0.02, rate_limit_chance=0.0, retry_after=1.0):
+        self.fake = fake
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit_chance = rate_limit_chance
+        self.retry_after = retry_after
+        self.requests = 0
+        self.rate_limited = 0
+        self.routes = {}
+    
+    async def _wait(self):
+        await asyncio.sleep(max(self.latency + random.uniform(-self.jitter, self.jitter), 0))
+    
+    async def request(self, route, **kwargs):
+        self.requests += 1
+        self.routes[route.key] = self.routes.get(route.key, 0) + 1
+        await self._wait()
+        
+        if self.rate_limit_chance and random.random() < self.rate_limit_chance:
+            self.rate_limited += 1
+            http_log.warning(
+                'We are being rate limited. %s %s responded with 429. Retrying in %.2f seconds.',
+                route.method, route.url, self.retry_after
+            )
+            await asyncio.sleep(self.retry_after)
+            await self._wait()
+        
+        if route.method == 'POST' and route.path == '/channels/{channel_id}/messages':
+            return self.fake.message_payload(route.channel_id, self.fake.bot_user_id, '')
+        if route.method == 'PATCH' and route.path == '/guilds/{guild_id}/members/{user_id}':
+            user_id = int(route.url.rsplit('/', 1)[1])
+            return self.fake.member_payload(user_id, f'member{user_id}', [])
+        if route.method == 'POST' and route.path == '/guilds/{guild_id}/bulk-ban':
+            return {'banned_users': kwargs['json']['user_ids'], 'failed_users': []}
+        if route.method == 'GET' and route.path == '/users/{user_id}':
+            user_id = int(route.url.rsplit('/', 1)[1])
+            return user_payload(user_id, f'user{user_id}')
+        return None
+
+class FakeDiscord:
+    """A guild with one category of text channels, roles and members"""
+    
+    def __init__(self, bot, members=1000, channels=50, roles=20, **http_options):
+        self.bot = bot
+        self.ids = itertools.count(BASE_ID)
+        self.http = FakeHTTP(self, **http_options)
+        self.guild_id = next(self.ids)
+        self.bot_user_id = next(self.ids)
+        self.owner_id = next(self.ids)
+        self.category_id = next(self.ids)
+        self.role_ids = [next(self.ids) for _ in range(roles)]
+        self.channel_ids = [next(self.ids) for _ in range(channels)]
+        self.member_ids = [next(self.ids) for _ in range(members)]
+        self.member_count = members
+    
+    async def start(self):
+        """Install the fake HTTP client and load the guild into the bot's cache"""
+        bot = self.bot
+        await bot._async_setup_hook()
+        bot.http.request = self.http.request
+        
+        state = bot._connection
+        state.user = discord.ClientUser(state=state, data=user_payload(self.bot_user_id, 'mod-bot', bot=True))
+        
+        guild = discord.Guild(data=self.guild_payload(), state=state)
+        state._add_guild(guild)
+        self.guild = guild
+        return guild
+    
+    def guild_payload(self):
+        roles = [self.role_payload(self.guild_id, '@everyone', 0, discord.Permissions.general().value)]
+        roles += [self.role_payload(role_id, f'role{i}', i + 1, 0) for i, role_id in enumerate(self.role_ids)]
+        
+        channels = [{'id': str(self.category_id), 'type': 4, 'name': 'moderated', 'position': 0, 'permission_overwrites': []}]
+        channels += [
+            {
+                'id': str(channel_id),
+                'type': 0,
+                'name': f'channel{i}',
+                'position': i,
+                'parent_id': str(self.category_id),
+                'permission_overwrites': [],
+                'nsfw': False,
+                'topic': None,
+                'rate_limit_per_user': 0,
+                'last_message_id': None,
+            }
+            for i, channel_id in enumerate(self.channel_ids)
+        ]
+        
+        members = [
+            self.member_payload(self.owner_id, 'owner', []),
+            self.member_payload(self.bot_user_id, 'mod-bot', [self.role_ids[-1]], bot=True),
+        ]
+        members += [
+            self.member_payload(member_id, f'member{i}', [self.role_ids[i % len(self.role_ids)]] if self.role_ids else [])
+            for i, member_id in enumerate(self.member_ids)
+        ]
+        
+        return {
+            'id': str(self.guild_id),
+            'name': 'Benchmark Guild',
+            'owner_id': str(self.owner_id),
+            'icon': None,
+            'roles': roles,
+            'channels': channels,
+            'members': members,
+            'member_count': len(members),
+            'emojis': [],
+            'stickers': [],
+            'features': [],
+            'verification_level': 0,
+            'default_message_notifications': 0,
+            'explicit_content_filter': 0,
+            'mfa_level': 0,
+            'afk_timeout': 300,
+            'system_channel_flags': 0,
+            'premium_tier': 0,
+            'preferred_locale': 'en-US',
+            'nsfw_level': 0,
+            'large': True,
+            'unavailable': False,
+        }
+    
+    def role_payload(self, role_id, name, position, permissions):
+        return {
+            'id': str(role_id),
+            'name': name,
+            'color': 0,
+            'hoist': False,
+            'position': position,
+            'permissions': str(permissions),
+            'managed': False,
+            'mentionable': False,
+        }
+    
+    def member_payload(self, user_id, name, role_ids, bot=False):
+        return {
+            'user': user_payload(user_id, name, bot),
+            'roles': [str(role_id) for role_id in role_ids],
+            'joined_at': _timestamp(),
+            'deaf': False,
+            'mute': False,
+            'flags': 0,
+        }
+    
+    def message_payload(self, channel_id, author_id, content):
+        return {
+            'id': str(next(self.ids)),
+            'channel_id': str(channel_id),
+            'guild_id': str(self.guild_id),
+            'author': user_payload(author_id, 'owner' if author_id == self.owner_id else 'mod-bot'),
+            'content': content,
+            'timestamp': _timestamp(),
+            'edited_timestamp': None,
+            'tts': False,
+            'mention_everyone': False,
+            'mentions': [],
+            'mention_roles': [],
+            'attachments': [],
+            'embeds': [],
+            'pinned': False,
+            'type': 0,
+        }
+    
+    def message(self, content, channel_id=None, author_id=None):
+        """A message from the guild owner, as if it arrived over the gateway"""
+        channel = self.guild.get_channel(channel_id or random.choice(self.channel_ids))
+        data = self.message_payload(channel.id, author_id or self.owner_id, content)
+        return discord.Message(state=self.bot._connection, channel=channel, data=data)
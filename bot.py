@@ -3,520 +3,3083 @@ from discord.ext import commands
 import json
 import os
 import asyncio
-from datetime import datetime, timedelta
+import bisect
+import contextvars
+import heapq
+import itertools
+import logging
+import math
+import sqlite3
+import subprocess
+import sys
+import time
+import traceback
+from array import array
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 import re
+from aiohttp import web
+
+try:
+    from re import _parser as regex_parser
+except ImportError:  # Before Python 3.11
+    import sre_parse as regex_parser
+
+PROCESS_STARTED = time.perf_counter()
 
 # Bot setup
 intents = discord.Intents.default()
 intents.message_content = True
 intents.members = True
-bot = commands.Bot(command_prefix='?', intents=intents)
 
-# Data storage (in memory for now)
-mod_stats = {}
-mod_logs = {}
-warnings = {}
-temp_roles = {}
-role_persist = {}
+# Sharding, set by launch_workers for each worker process
+SHARD_COUNT = int(os.getenv('MODBOT_SHARD_COUNT', '0')) or None
+SHARD_IDS = [int(shard_id) for shard_id in os.getenv('MODBOT_SHARD_IDS', '').split(',') if shard_id]
+WORKER_COUNT = int(os.getenv('MODBOT_WORKERS', '1'))
+WORKER_INDEX = int(os.getenv('MODBOT_WORKER', '0'))
+
+# Member lists are chunked per guild on first use (see ensure_chunked) instead of before on_ready
+if SHARD_IDS:
+    bot = commands.AutoShardedBot(
+        command_prefix='?', intents=intents, help_command=None, chunk_guilds_at_startup=False,
+        shard_ids=SHARD_IDS, shard_count=SHARD_COUNT
+    )
+else:
+    bot = commands.Bot(command_prefix='?', intents=intents, help_command=None, chunk_guilds_at_startup=False)
+
+# Command extensions and the commands they provide, loaded when one of their commands is first used
+EXTENSIONS = {
+    'cogs.moderation': (
+        'kick', 'ban', 'mute', 'unmute', 'unban', 'globalunban', 'massban', 'masskick', 'massmute',
+        'warn', 'warnings', 'modstats', 'modlogs', 'escalation', 'auditlog'
+    ),
+    'cogs.channels': ('slowmode', 'lock', 'unlock', 'lockall', 'unlockall', 'lockdown', 'unlockdown', 'purge'),
+    'cogs.protection': ('automod', 'raid'),
+    'cogs.utility': ('say', 'temprole', 'untemprole'),
+    'cogs.info': ('membercount', 'serverinfo', 'roleinfo'),
+    'cogs.analytics': ('analytics',),
+}
+LAZY_COMMANDS = {name: extension for extension, names in EXTENSIONS.items() for name in names}
+
+# Data storage (in memory, backed by the SQLite store below)
+guild_states = {}  # guild_id -> GuildState, loaded on first use and evicted when idle
+automod_configs = {}  # guild_id -> AutoModConfig, every configured guild, loaded at startup
+temp_roles = {}  # (guild_id, user_id, role_id) -> {'expires': datetime}
+role_persist = {}  # (guild_id, user_id) -> RoleSnapshot, kept in expiry order
+role_sets = {}  # packed role IDs -> [array of role IDs, snapshots using it]
+
+# Min-heap of (expires, key) driving temp_role_handler, stale entries are skipped lazily
+temp_role_heap = []
+temp_role_wakeup = asyncio.Event()
+temp_role_task = None
+data_flush_task = None
+guild_sweep_task = None
+member_recount_task = None
+loop_lag_task = None
+chunk_task = None
+extension_task = None
+metrics_runner = None
+chunk_tasks = {}  # guild_id -> task chunking that guild's members
+extension_lock = asyncio.Lock()
+startup_timings = {}  # Seconds from process start to ready, all extensions loaded and all guilds chunked
+
+DATA_FILE = os.getenv('MODBOT_DB', 'modbot.db')
+FLUSH_INTERVAL = 1.0  # Seconds between group commits
+FLUSH_BATCH_SIZE = 500  # Flush early once this many writes are queued
+FLUSH_RETRIES = 5  # Flushes a batch is retried for while the database is locked before it's dropped
+CHECKPOINT_INTERVAL = 600  # Seconds between WAL checkpoints
+GUILD_IDLE_TIMEOUT = 1800  # Evict guild state unused for this many seconds
+GUILD_MEMORY_BUDGET = 64 * 1024 * 1024  # Evict least recently used guilds above this many bytes
+GUILD_SWEEP_INTERVAL = 300  # Seconds between idle guild sweeps
+AUTOMOD_WINDOW = 10  # Seconds of message history the spam counters look at
+AUTOMOD_SPAM_LIMIT = 8  # Messages per user per window before they're muted
+AUTOMOD_DUPLICATE_LIMIT = 3  # Identical messages per user per window
+AUTOMOD_CHANNEL_DUPLICATE_LIMIT = 5  # Identical long messages per channel per window, from anyone, before slowmode
+AUTOMOD_CHANNEL_DUPLICATE_LENGTH = 30  # Characters a message needs to count towards channel duplicates
+AUTOMOD_FLOOD_LIMIT = 40  # Messages per channel per window before slowmode is enabled
+AUTOMOD_FLOOD_SLOWMODE = 5  # Seconds of slowmode applied to a flooded channel
+AUTOMOD_FLOOD_SLOWMODE_DURATION = 600  # Seconds before flood slowmode is lifted again
+AUTOMOD_SPAM_MUTE = 600  # Seconds a spammer is timed out for
+AUTOMOD_ACTION_COOLDOWN = 15  # Seconds between automod actions against the same user
+RAID_WINDOW = 10  # Seconds of joins the raid detector looks at
+RAID_JOIN_LIMIT = 10  # Joins per window that can start a raid...
+RAID_NEW_ACCOUNT_SHARE = 0.5  # ...if at least this share of them are new accounts
+RAID_NAME_CLUSTER = 5  # Joins per window with near-identical names that start a raid on their own
+RAID_NEW_ACCOUNT_AGE = 7 * 86400  # Accounts younger than this many seconds count as new
+RAID_MODE_DURATION = 600  # Seconds raid mode lasts after the last suspicious join
+RAID_SLOWMODE = 30  # Seconds of slowmode applied to every text channel during a raid
+RAID_BATCH_DELAY = 5  # Seconds suspicious accounts are collected before acting on them together
+RAID_ACTION = 'timeout'  # What happens to suspicious accounts: 'timeout' or 'ban'
+RAID_TIMEOUT = 3600  # Seconds suspicious accounts are timed out for
+MEMBER_RECOUNT_INTERVAL = 3600  # Seconds between member counter reconciliations
+MEMBER_RECOUNT_BATCH = 5000  # Members counted between yields to the event loop
+BULK_CONCURRENCY = 8  # Parallel API calls per bulk operation
+BULK_RATE = 40  # API calls per second across all bulk operations, below Discord's global limit of 50
+RENDER_CACHE_SIZE = 1000  # Rendered warnings/modlogs embeds kept
+RENDER_CACHE_TTL = 300  # Seconds a rendered embed is reused
+HISTORY_COUNT_CACHE_SIZE = 10000  # Users whose warnings/modlogs counts are kept
+HISTORY_COUNT_CACHE_TTL = 60  # Seconds a count is reused, new entries drop it sooner
+MOD_NAME_CACHE_SIZE = 10000  # Moderator display names kept
+MOD_NAME_CACHE_TTL = 600  # Seconds before a moderator name is looked up again
+HISTORY_PAGE_SIZE = 10  # Entries per warnings/modlogs page
+NO_REASON = 'No reason provided'  # Reason shown for actions without one, mod logs store it as NULL
+WARNING_TIME_SIZE = 8  # Bytes per warning timestamp kept for escalation
+PAGINATOR_TIMEOUT = 180  # Seconds before page buttons stop responding
+LOOP_LAG_INTERVAL = 0.5  # Seconds between event loop lag samples
+TEMP_ROLE_OVERRUN = 1.0  # Seconds late before a temp role removal counts as an overrun
+METRICS_PORT = os.getenv('MODBOT_METRICS_PORT')  # Serve Prometheus metrics on localhost when set
+MASS_ACTION_LIMIT = 1000  # Max users per mass moderation command
+BULK_BAN_SIZE = 200  # Max users per bulk ban request
+SHARD_POLL_INTERVAL = 1.0  # Seconds between checks for cross-shard tasks
+SHARD_TASK_TIMEOUT = 30  # Seconds to wait for every worker to answer a cross-shard task
+SHARD_TASK_TTL = 3600  # Seconds cross-shard tasks and their results are kept
+SHARD_IDENTIFY_DELAY = 5  # Seconds per shard between worker process starts, Discord allows one identify per 5s
+ROLE_PERSIST_TTL = 30 * 86400  # Seconds a leaving member's roles are kept for their return
+ANALYTICS_DAYS = 91  # Days of per-day action counts kept in memory for analytics
+OFFENSE_ACTIONS = ('warn', 'mute', 'kick', 'ban')  # Actions that count towards repeat offender rankings
+AUDIT_QUEUE_LIMIT = 500  # Audit log embeds waiting per guild before new ones are dropped
+AUDIT_FLUSH_DELAY = 2.0  # Seconds to collect audit log embeds before posting them together
+AUDIT_POST_RATE = 1  # Audit log messages per second per guild
+PURGE_LIMIT = 10000  # Max messages deleted per purge
+PURGE_SCAN_LIMIT = 20000  # Max messages looked at per filtered purge
+PURGE_PATTERN_LIMIT = 100  # Max characters in a purge match regex
+PURGE_PATTERN_REPEATS = 2  # Max unbounded repeats (*, +, {n,}) in a purge match regex
+PURGE_OLD_RATE = 1  # Deletes per second for messages too old to bulk delete
+PURGE_PROGRESS_INTERVAL = 3  # Seconds between purge progress updates
+COMMAND_USER_RATE = 0.5  # Commands per second one user can run...
+COMMAND_USER_BURST = 5  # ...after a burst of this many
+COMMAND_GUILD_RATE = 5  # Commands per second non-moderators can run per guild...
+COMMAND_GUILD_BURST = 20  # ...after a burst of this many
+COMMAND_LIMIT_NOTICE = 10  # Seconds between "slow down" replies to the same user
+INFO_CACHE_SIZE = 1000  # Rendered info embeds kept
+INFO_CACHE_TTL = 30  # Seconds an info embed is reused for identical requests
+
+def is_database_locked(error):
+    """Whether a SQLite error is another connection holding the lock, which is worth retrying"""
+    code = getattr(error, 'sqlite_errorcode', None)
+    if code is not None:
+        return code & 0xff in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+    return isinstance(error, sqlite3.OperationalError) and 'locked' in str(error)
+
+class DataStore:
+    """SQLite (WAL mode) persistence with batched writes
+    
+    Writes are queued in memory and committed as one transaction on a
+    dedicated worker thread, so bursts of moderation actions never block
+    the event loop. Reads use a separate connection, which WAL mode allows
+    to run alongside the writer.
+    """
+    
+    SCHEMA_VERSION = 5
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS mod_stats (
+            guild_id INTEGER NOT NULL,
+            mod_id INTEGER NOT NULL,
+            action TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (guild_id, mod_id, action)
+        );
+        CREATE TABLE IF NOT EXISTS log_actions (
+            id INTEGER PRIMARY KEY,
+            action TEXT NOT NULL UNIQUE
+        );
+        CREATE TABLE IF NOT EXISTS log_reasons (
+            id INTEGER PRIMARY KEY,
+            reason TEXT NOT NULL UNIQUE
+        );
+        CREATE TABLE IF NOT EXISTS mod_logs (
+            id INTEGER PRIMARY KEY,
+            guild_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            action_id INTEGER NOT NULL,
+            mod_id INTEGER NOT NULL,
+            reason_id INTEGER,
+            timestamp INTEGER NOT NULL,
+            duration TEXT
+        );
+        CREATE INDEX IF NOT EXISTS mod_logs_user_time ON mod_logs (guild_id, user_id, timestamp);
+        CREATE TABLE IF NOT EXISTS action_days (
+            guild_id INTEGER NOT NULL,
+            day INTEGER NOT NULL,
+            action TEXT NOT NULL,
+            mod_id INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (guild_id, day, action, mod_id)
+        );
+        CREATE TABLE IF NOT EXISTS offenders (
+            guild_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            last_action INTEGER NOT NULL,
+            PRIMARY KEY (guild_id, user_id)
+        );
+        CREATE TABLE IF NOT EXISTS warnings (
+            id INTEGER PRIMARY KEY,
+            guild_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            reason TEXT NOT NULL,
+            mod_id INTEGER NOT NULL,
+            timestamp TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS warnings_user ON warnings (guild_id, user_id);
+        CREATE TABLE IF NOT EXISTS temp_roles (
+            guild_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            role_id INTEGER NOT NULL,
+            expires REAL NOT NULL,
+            PRIMARY KEY (guild_id, user_id, role_id)
+        );
+        CREATE TABLE IF NOT EXISTS role_persist (
+            guild_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            role_ids TEXT NOT NULL,
+            expires REAL NOT NULL,
+            PRIMARY KEY (guild_id, user_id)
+        );
+        CREATE TABLE IF NOT EXISTS escalation_policy (
+            guild_id INTEGER PRIMARY KEY,
+            expiry TEXT,
+            rules TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS shard_tasks (
+            id INTEGER PRIMARY KEY,
+            kind TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            created REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS shard_results (
+            task_id INTEGER NOT NULL,
+            worker TEXT NOT NULL,
+            result TEXT NOT NULL,
+            PRIMARY KEY (task_id, worker)
+        );
+        CREATE TABLE IF NOT EXISTS audit_config (
+            guild_id INTEGER PRIMARY KEY,
+            channel_id INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS automod_config (
+            guild_id INTEGER PRIMARY KEY,
+            enabled INTEGER NOT NULL,
+            block_links INTEGER NOT NULL,
+            banned_words TEXT NOT NULL
+        );
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        # Worker processes share the database, so wait for each other's write locks
+        self.writer = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.writer.execute('PRAGMA journal_mode=WAL')
+        self.writer.execute('PRAGMA synchronous=NORMAL')
+        self._migrate()
+        self.reader = sqlite3.connect(path, timeout=30)
+        self.pending = []
+        self.retries = 0  # Consecutive flushes that found the database locked
+        self.requeued = 0  # Batches put back in pending so far, lets sync() notice its writes went back
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='datastore')
+        self.last_checkpoint = time.monotonic()
+    
+    def _migrate(self):
+        version = self.writer.execute('PRAGMA user_version').fetchone()[0]
+        existing = self.writer.execute("SELECT 1 FROM sqlite_master WHERE name = 'mod_logs'").fetchone()
+        
+        if existing and version < 1:
+            # Rows from before per-guild state don't know their guild, keep them under guild 0
+            self.writer.executescript("""
+                ALTER TABLE mod_logs ADD COLUMN guild_id INTEGER NOT NULL DEFAULT 0;
+                ALTER TABLE warnings ADD COLUMN guild_id INTEGER NOT NULL DEFAULT 0;
+                DROP INDEX IF EXISTS mod_logs_user;
+                DROP INDEX IF EXISTS mod_logs_user_time;
+                DROP INDEX IF EXISTS warnings_user;
+                ALTER TABLE mod_stats RENAME TO mod_stats_legacy;
+            """)
+            self.writer.executescript(self.SCHEMA)
+            self.writer.executescript("""
+                INSERT INTO mod_stats SELECT 0, mod_id, action, count FROM mod_stats_legacy;
+                DROP TABLE mod_stats_legacy;
+            """)
+        
+        if existing and version < 2:
+            # Mod log timestamps go from local ISO strings to epoch seconds
+            self.writer.executescript("""
+                DROP INDEX IF EXISTS mod_logs_user;
+                DROP INDEX IF EXISTS mod_logs_user_time;
+                ALTER TABLE mod_logs RENAME TO mod_logs_legacy;
+                CREATE TABLE mod_logs (
+                    id INTEGER PRIMARY KEY,
+                    guild_id INTEGER NOT NULL,
+                    user_id INTEGER NOT NULL,
+                    action TEXT NOT NULL,
+                    mod_id INTEGER NOT NULL,
+                    reason TEXT NOT NULL,
+                    timestamp INTEGER NOT NULL,
+                    duration TEXT
+                );
+                INSERT INTO mod_logs (id, guild_id, user_id, action, mod_id, reason, timestamp, duration)
+                    SELECT id, guild_id, user_id, action, mod_id, reason,
+                           CAST(strftime('%s', timestamp, 'utc') AS INTEGER), duration
+                    FROM mod_logs_legacy;
+                DROP TABLE mod_logs_legacy;
+            """)
+        
+        if existing and version < 4:
+            # Analytics aggregates start out as a summary of the existing mod logs
+            self.writer.executescript(self.SCHEMA)
+            self.writer.executescript(f"""
+                INSERT INTO action_days (guild_id, day, action, mod_id, count)
+                    SELECT guild_id, timestamp / 86400, action, mod_id, COUNT(*) FROM mod_logs
+                    GROUP BY guild_id, timestamp / 86400, action, mod_id;
+                INSERT INTO offenders (guild_id, user_id, count, last_action)
+                    SELECT guild_id, user_id, COUNT(*), MAX(timestamp) FROM mod_logs
+                    WHERE action IN ({', '.join(f"'{action}'" for action in OFFENSE_ACTIONS)})
+                    GROUP BY guild_id, user_id;
+            """)
+        
+        if existing and version < 5:
+            # Actions and reasons repeat across entries, store each once and keep IDs in the log
+            self.writer.executescript("""
+                DROP INDEX IF EXISTS mod_logs_user;
+                DROP INDEX IF EXISTS mod_logs_user_time;
+                ALTER TABLE mod_logs RENAME TO mod_logs_legacy;
+            """)
+            self.writer.executescript(self.SCHEMA)
+            self.writer.executescript(f"""
+                INSERT OR IGNORE INTO log_actions (action) SELECT DISTINCT action FROM mod_logs_legacy;
+                INSERT OR IGNORE INTO log_reasons (reason)
+                    SELECT DISTINCT reason FROM mod_logs_legacy WHERE reason != '{NO_REASON}';
+                INSERT INTO mod_logs (id, guild_id, user_id, action_id, mod_id, reason_id, timestamp, duration)
+                    SELECT l.id, l.guild_id, l.user_id, a.id, l.mod_id, r.id, l.timestamp, l.duration
+                    FROM mod_logs_legacy l
+                    JOIN log_actions a ON a.action = l.action
+                    LEFT JOIN log_reasons r ON r.reason = l.reason;
+                DROP TABLE mod_logs_legacy;
+            """)
+        
+        columns = [row[1] for row in self.writer.execute('PRAGMA table_info(role_persist)')]
+        if columns and 'expires' not in columns:
+            # Persisted roles expire, existing snapshots get a full TTL from now
+            self.writer.executescript(f"""
+                ALTER TABLE role_persist ADD COLUMN expires REAL NOT NULL DEFAULT 0;
+                UPDATE role_persist SET expires = CAST(strftime('%s', 'now') AS REAL) + {ROLE_PERSIST_TTL};
+            """)
+        
+        self.writer.executescript(self.SCHEMA)
+        self.writer.execute(f'PRAGMA user_version = {self.SCHEMA_VERSION}')
+        self.writer.commit()
+    
+    def queue(self, sql, params=()):
+        """Queue a write to be committed with the next batch"""
+        self._queue(sql, params, False)
+    
+    def queue_many(self, sql, rows):
+        """Queue the same write for many rows, committed with the next batch"""
+        self._queue(sql, rows, True)
+    
+    def _queue(self, sql, params, many):
+        self.pending.append((sql, params, many))
+        if len(self.pending) >= FLUSH_BATCH_SIZE:
+            try:
+                asyncio.get_running_loop().create_task(self.flush())
+            except RuntimeError:
+                pass  # No loop yet (startup), the next flush picks it up
+    
+    def _execute(self, sql, params, many):
+        if many:
+            self.writer.executemany(sql, params)
+        else:
+            self.writer.execute(sql, params)
+    
+    def _write_batch(self, batch):
+        """Commit a batch in one transaction
+        
+        A locked database is raised so the batch can be retried. Any other
+        error means a statement in it can never succeed, so the batch is
+        written again one statement per transaction and only the failing
+        statements are dropped.
+        """
+        try:
+            with self.writer:
+                for sql, params, many in batch:
+                    self._execute(sql, params, many)
+        except sqlite3.Error as e:
+            if is_database_locked(e):
+                raise
+            for sql, params, many in batch:
+                try:
+                    with self.writer:
+                        self._execute(sql, params, many)
+                except sqlite3.Error as e:
+                    print(f"Error writing queued statement, dropped it: {e} ({sql})")
+    
+    def _batch_done(self, batch, future):
+        # Runs once the executor is done with the batch, even if the flush awaiting it was cancelled
+        if future.cancelled():
+            self.pending[:0] = batch  # Never reached the writer thread
+            self.requeued += 1
+            return
+        error = future.exception()
+        if error is None:
+            self.retries = 0
+        elif is_database_locked(error) and self.retries < FLUSH_RETRIES:
+            self.retries += 1
+            self.requeued += 1
+            self.pending[:0] = batch
+        else:
+            self.retries = 0
+            print(f"Error writing queued batch, dropped {len(batch)} writes: {error}")
+    
+    async def flush(self):
+        """Commit all queued writes in one transaction off the event loop
+        
+        If the database stays locked (e.g. by another worker) the batch goes
+        back to the front of the queue, up to FLUSH_RETRIES times.
+        Cancelling a flush doesn't cancel a batch already handed to the
+        writer thread, it still commits.
+        """
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, []
+        future = asyncio.get_running_loop().run_in_executor(self.executor, self._write_batch, batch)
+        future.add_done_callback(lambda future: self._batch_done(batch, future))
+        await asyncio.shield(future)
+    
+    async def sync(self):
+        """Wait until every write queued before the call is committed
+        
+        Writes queued while waiting aren't waited for, so a burst of writes
+        can't keep a reader here. Batches another flush already took count
+        too, the executor has one thread and runs them first.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            requeued = self.requeued
+            try:
+                await self.flush()
+            except sqlite3.Error as e:
+                if not is_database_locked(e):
+                    raise
+            await loop.run_in_executor(self.executor, lambda: None)
+            # Done callbacks run before this resumes, so a batch that went back to pending shows here
+            if self.requeued == requeued:
+                return
+    
+    def _insert(self, sql, params):
+        with self.writer:
+            return self.writer.execute(sql, params).lastrowid
+    
+    async def insert(self, sql, params=()):
+        """Insert a row now, after anything already queued, and return its ID"""
+        await self.flush()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self._insert, sql, params)
+    
+    async def checkpoint(self):
+        """Fold the WAL back into the main database file"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.executor, self.writer.execute, 'PRAGMA wal_checkpoint(TRUNCATE)')
+        self.last_checkpoint = time.monotonic()
+    
+    def close(self):
+        """Write anything still queued and close the database
+        
+        Batches already handed to the writer thread are waited for, not
+        written again, pending only holds writes no flush has taken.
+        """
+        self.executor.shutdown(wait=True)
+        batch, self.pending = self.pending, []
+        self._write_batch(batch)
+        self.writer.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        self.writer.close()
+        self.reader.close()
+    
+    def iter_rows(self, sql, params=()):
+        """Stream rows from the database without building a full list"""
+        yield from self.reader.execute(sql, params)
+
+store = None
 
 def save_data():
-    """Save all data to files"""
-    pass  # Will implement file saving if needed
+    """Write all queued changes to disk"""
+    if store:
+        store.close()
 
 def load_data():
-    """Load data from files"""
-    pass  # Will implement file loading if needed
+    """Open the database and load the data needed at startup
+    
+    Only scheduled temp roles, role snapshots and automod configs are
+    loaded up front, guild state is read when a guild is first used (see
+    get_guild_state).
+    """
+    global store
+    store = DataStore(DATA_FILE)
+    
+    for guild_id, user_id, role_id, expires in store.iter_rows('SELECT guild_id, user_id, role_id, expires FROM temp_roles'):
+        if not backend.owns_guild(guild_id):
+            continue  # Another worker's guild, it handles the removal
+        key = (guild_id, user_id, role_id)
+        expires = datetime.fromtimestamp(expires)
+        temp_roles[key] = {'expires': expires}
+        temp_role_heap.append((expires, key))
+    heapq.heapify(temp_role_heap)
+    
+    now = time.time()
+    store.queue('DELETE FROM role_persist WHERE expires <= ?', (now,))
+    rows = store.iter_rows(
+        'SELECT guild_id, user_id, role_ids, expires FROM role_persist WHERE expires > ? ORDER BY expires', (now,)
+    )
+    for guild_id, user_id, role_ids, expires in rows:
+        if not backend.owns_guild(guild_id):
+            continue
+        roles = intern_role_set(int(role_id) for role_id in role_ids.split(',') if role_id)
+        role_persist[(guild_id, user_id)] = RoleSnapshot(roles, expires)
+    
+    # Automod runs on every message, so its configs are kept apart from the guild state
+    for guild_id, enabled, block_links, banned_words in store.iter_rows('SELECT guild_id, enabled, block_links, banned_words FROM automod_config'):
+        automod_configs[guild_id] = AutoModConfig(bool(enabled), bool(block_links), banned_words.split('\n') if banned_words else [])
+
+class ModLogEntry:
+    """A mod log entry read back for a history page, timestamp is in epoch seconds"""
+    
+    __slots__ = ('action', 'mod_id', 'reason', 'timestamp', 'duration')
+    
+    def __init__(self, action, mod_id, reason, timestamp, duration):
+        self.action = action
+        self.mod_id = mod_id
+        self.reason = reason
+        self.timestamp = timestamp
+        self.duration = duration
+
+def trie_pattern(words):
+    """Build a regex from a trie of words
+    
+    Shared prefixes are merged, so at each position the regex engine
+    follows a single branch instead of trying every word in turn.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}  # End of a word
+    
+    def build(node):
+        optional = '' in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        if len(branches) == 1 and not optional:
+            return branches[0]
+        return '(?:' + '|'.join(branches) + ')' + ('?' if optional else '')
+    
+    return build(trie)
+
+LINK_PATTERN = r'(?:https?://|www\.|discord(?:\.gg|(?:app)?\.com/invite)/)\S+'
+
+class AutoModConfig:
+    """A guild's automod settings, matcher checks banned words and links in one pass"""
+    
+    __slots__ = ('enabled', 'block_links', 'banned_words', 'matcher')
+    
+    def __init__(self, enabled=False, block_links=False, banned_words=()):
+        self.enabled = enabled
+        self.block_links = block_links
+        self.banned_words = set(banned_words)
+        self.compile()
+    
+    def compile(self):
+        parts = []
+        if self.banned_words:
+            parts.append(rf'(?P<word>\b{trie_pattern(self.banned_words)}\b)')
+        if self.block_links:
+            parts.append(f'(?P<link>{LINK_PATTERN})')
+        self.matcher = re.compile('|'.join(parts), re.IGNORECASE) if parts else None
+
+ESCALATION_ACTIONS = ('mute', 'kick', 'ban')  # Least to most severe
+
+class EscalationRule:
+    """Act on a user once they reach warns active warnings within window"""
+    
+    __slots__ = ('warns', 'window', 'action', 'duration', 'seconds')
+    
+    def __init__(self, warns, window, action, duration=None):
+        self.warns = warns
+        self.window = window  # Duration string like '24h', None counts every active warning
+        self.action = action
+        self.duration = duration  # Mute duration string
+        self.seconds = parse_time(duration) if duration else None
+    
+    @property
+    def trigger(self):
+        return f"{self.warns} warnings in {self.window}" if self.window else f"{self.warns} warnings"
+    
+    @property
+    def severity(self):
+        return (ESCALATION_ACTIONS.index(self.action), self.seconds or 0)
+    
+    def describe(self):
+        action = f"mute for {self.duration}" if self.action == 'mute' else self.action
+        return f"{self.trigger} → {action}"
+    
+    def serialize(self):
+        return ' '.join([str(self.warns), self.window or 'all', self.action] + ([self.duration] if self.duration else []))
+    
+    @classmethod
+    def parse(cls, line):
+        warns, window, action, *duration = line.split()
+        return cls(int(warns), None if window == 'all' else window, action, duration[0] if duration else None)
+
+class EscalationPolicy:
+    """A guild's escalation rules and warning expiry
+    
+    Rules are compiled into the distinct windows they count over and a
+    (window, count) -> rule table, so a new warning is checked with one
+    lookup per window.
+    """
+    
+    __slots__ = ('expiry', 'rules', 'windows', 'thresholds')
+    
+    def __init__(self, expiry=None, rules=()):
+        self.expiry = expiry  # Duration string, older warnings stop counting. None keeps them forever
+        self.rules = list(rules)
+        self.compile()
+    
+    def compile(self):
+        expiry = parse_time(self.expiry) if self.expiry else math.inf
+        windows = {expiry}
+        thresholds = {}
+        for rule in self.rules:
+            window = min(parse_time(rule.window), expiry) if rule.window else expiry
+            windows.add(window)
+            current = thresholds.get((window, rule.warns))
+            if current is None or rule.severity > current.severity:
+                thresholds[(window, rule.warns)] = rule
+        self.windows = sorted(windows)  # Ascending, so the last window is the expiry
+        self.thresholds = thresholds
+    
+    def triggered(self, counts):
+        """The most severe rule hit by a user's counts per window, if any"""
+        hit = None
+        for window, count in zip(self.windows, counts):
+            rule = self.thresholds.get((window, count))
+            if rule and (hit is None or rule.severity > hit.severity):
+                hit = rule
+        return hit
+
+class WarnCounter:
+    """Rolling counts of a user's warnings over each policy window
+    
+    Timestamps are kept oldest first with one cursor per window, cursors
+    only move forward as warnings age out, so updating the counts is
+    amortised O(1) per window.
+    """
+    
+    __slots__ = ('times', 'starts')
+    
+    def __init__(self, window_count):
+        self.times = []  # Warning timestamps in epoch seconds, oldest first
+        self.starts = [0] * window_count  # Index of the first timestamp inside each window
+    
+    def counts(self, windows, now):
+        """Warnings inside each window, windows must be ascending"""
+        times = self.times
+        total = len(times)
+        starts = self.starts
+        for i, window in enumerate(windows):
+            start = starts[i]
+            cutoff = now - window
+            while start < total and times[start] <= cutoff:
+                start += 1
+            starts[i] = start
+        
+        # The longest window has the earliest cursor, anything before it has expired
+        expired = starts[-1]
+        if expired >= 32 and expired * 2 >= total:
+            del times[:expired]
+            self.starts = [start - expired for start in starts]
+            total -= expired
+        return [total - start for start in self.starts]
+
+class RankedCounter:
+    """Counts per key, with the keys kept sorted by count for top-K queries"""
+    
+    __slots__ = ('counts', 'ranking')
+    
+    def __init__(self):
+        self.counts = {}
+        self.ranking = []  # (-count, key), so the highest counts come first
+    
+    def __len__(self):
+        return len(self.counts)
+    
+    def add(self, key, count=1):
+        old = self.counts.get(key, 0)
+        if old:
+            del self.ranking[bisect.bisect_left(self.ranking, (-old, key))]
+        new = self.counts[key] = old + count
+        bisect.insort(self.ranking, (-new, key))
+    
+    def top(self, k, minimum=1):
+        """The k keys with the highest counts, as (key, count), skipping counts below minimum"""
+        end = bisect.bisect_right(self.ranking, (-minimum, math.inf))
+        return [(key, -count) for count, key in self.ranking[:min(k, end)]]
+
+class GuildAnalytics:
+    """Aggregates behind the analytics commands, updated as actions are logged
+    
+    days holds per-day counts for the last ANALYTICS_DAYS days, keyed by
+    day number since the epoch (UTC). Moderators are ranked by their mod
+    stats totals, offenders by their count of OFFENSE_ACTIONS.
+    """
+    
+    __slots__ = ('days', 'moderators', 'offenders', 'last_offense')
+    
+    def __init__(self):
+        self.days = {}  # day -> {(action, mod_id): count}
+        self.moderators = RankedCounter()
+        self.offenders = RankedCounter()
+        self.last_offense = {}  # user_id -> timestamp of their latest offense
+    
+    @property
+    def size(self):
+        buckets = sum(len(day) for day in self.days.values())
+        return buckets * 120 + (len(self.offenders) + len(self.moderators)) * 200
+    
+    def record(self, day, action, mod_id, count):
+        buckets = self.days.get(day)
+        if buckets is None:
+            buckets = self.days[day] = {}
+            for old in [old for old in self.days if old <= day - ANALYTICS_DAYS]:
+                del self.days[old]
+        key = (action, mod_id)
+        buckets[key] = buckets.get(key, 0) + count
+    
+    def record_offenses(self, user_ids, timestamp):
+        for user_id in user_ids:
+            self.offenders.add(user_id)
+            self.last_offense[user_id] = timestamp
+    
+    def action_counts(self, first_day, last_day):
+        """Per-day {action: count} for days first_day..last_day"""
+        result = {}
+        for day in range(first_day, last_day + 1):
+            counts = {}
+            for (action, _), count in self.days.get(day, {}).items():
+                counts[action] = counts.get(action, 0) + count
+            result[day] = counts
+        return result
+    
+    def top_moderators(self, k, since_day=None):
+        """Moderators with the most actions, all time or since a day"""
+        if since_day is None:
+            return self.moderators.top(k)
+        totals = RankedCounter()
+        for day, buckets in self.days.items():
+            if day >= since_day:
+                for (_, mod_id), count in buckets.items():
+                    totals.add(mod_id, count)
+        return totals.top(k)
+
+class GuildState:
+    """Moderation state for a single guild
+    
+    Mod stats are loaded with the state. Mod logs and warnings stay on
+    disk and are read a page at a time, only warning timestamps are kept
+    per user for escalation. size is a running estimate of the memory
+    held, used to pick guilds to evict.
+    """
+    
+    __slots__ = (
+        'guild_id', 'mod_stats', 'warning_times', 'warn_counters', 'escalation',
+        'automod', 'analytics', 'audit_channel_id', 'last_used', 'size'
+    )
+    
+    def __init__(self, guild_id):
+        self.guild_id = guild_id
+        self.mod_stats = {}
+        self.warning_times = {}  # user_id -> array of warning timestamps in epoch seconds, oldest first
+        self.warn_counters = {}  # user_id -> WarnCounter, built from warnings on first use
+        self.escalation = EscalationPolicy()
+        self.automod = automod_configs.get(guild_id) or AutoModConfig()
+        self.analytics = None  # GuildAnalytics, loaded on first use
+        self.audit_channel_id = None
+        self.last_used = time.monotonic()
+        self.size = 0
+        
+        if store:
+            rows = store.iter_rows('SELECT mod_id, action, count FROM mod_stats WHERE guild_id = ?', (guild_id,))
+            for mod_id, action, count in rows:
+                self._stats_for(mod_id)[action] = count
+            
+            rows = store.iter_rows('SELECT expiry, rules FROM escalation_policy WHERE guild_id = ?', (guild_id,))
+            for expiry, rules in rows:
+                self.escalation = EscalationPolicy(expiry, [EscalationRule.parse(line) for line in rules.split('\n') if line])
+            
+            for (channel_id,) in store.iter_rows('SELECT channel_id FROM audit_config WHERE guild_id = ?', (guild_id,)):
+                self.audit_channel_id = channel_id
+    
+    def save_automod(self):
+        """Queue the automod config to be written"""
+        config = self.automod
+        config.compile()
+        automod_configs[self.guild_id] = config
+        if store:
+            store.queue(
+                'INSERT OR REPLACE INTO automod_config (guild_id, enabled, block_links, banned_words) VALUES (?, ?, ?, ?)',
+                (self.guild_id, int(config.enabled), int(config.block_links), '\n'.join(sorted(config.banned_words)))
+            )
+    
+    def save_audit_channel(self):
+        """Queue the audit channel setting to be written"""
+        if not store:
+            return
+        if self.audit_channel_id:
+            store.queue(
+                'INSERT OR REPLACE INTO audit_config (guild_id, channel_id) VALUES (?, ?)',
+                (self.guild_id, self.audit_channel_id)
+            )
+        else:
+            store.queue('DELETE FROM audit_config WHERE guild_id = ?', (self.guild_id,))
+    
+    def save_escalation(self):
+        """Recompile the escalation policy and queue it to be written"""
+        policy = self.escalation
+        policy.compile()
+        self.warn_counters.clear()  # Counters are per window, rebuild them for the new windows
+        if store:
+            store.queue(
+                'INSERT OR REPLACE INTO escalation_policy (guild_id, expiry, rules) VALUES (?, ?, ?)',
+                (self.guild_id, policy.expiry, '\n'.join(rule.serialize() for rule in policy.rules))
+            )
+    
+    def _stats_for(self, mod_id):
+        stats = self.mod_stats.get(mod_id)
+        if stats is None:
+            stats = self.mod_stats[mod_id] = {
+                'kicks': 0, 'bans': 0, 'mutes': 0, 'warns': 0, 'unmutes': 0, 'unbans': 0, 'other': 0
+            }
+            self.size += sys.getsizeof(stats)
+        return stats
+    
+    async def count_mod_logs(self, user_id, seconds=None):
+        """Count a user's mod log entries, only those from the last seconds if given
+        
+        Returns the count, the newest entry's ID and the epoch timestamp the
+        count starts at (None for all entries). Pages read up to that ID
+        stay stable while new entries are logged. Counts are cached until
+        the user gets a new entry, so repeated views don't force a commit.
+        """
+        if not store:
+            return 0, 0, None
+        key = (self.guild_id, user_id, 'modlogs')
+        counts = history_counts.get(key)
+        if counts and seconds in counts:
+            return counts[seconds]
+        
+        dropped = history_counts.dropped
+        await store.sync()  # Entries still queued aren't in the table yet
+        sql = 'SELECT COUNT(*), MAX(id) FROM mod_logs WHERE guild_id = ? AND user_id = ?'
+        params = (self.guild_id, user_id)
+        since = None
+        if seconds:
+            since = int(time.time()) - seconds
+            sql += ' AND timestamp >= ?'
+            params += (since,)
+        count, last_id = next(store.iter_rows(sql, params))
+        result = count, last_id or 0, since
+        # An entry logged while syncing may not be in the count, only cache it if nothing was dropped meanwhile
+        if history_counts.dropped == dropped:
+            counts = history_counts.get(key) or {}
+            counts[seconds] = result
+            history_counts.set(key, counts)
+        return result
+    
+    def mod_log_page(self, user_id, last_id, page, since=None):
+        """Read one page of a user's mod log, page 0 holds the newest entries, oldest first"""
+        if not store:
+            return []
+        sql = (
+            'SELECT a.action, m.mod_id, COALESCE(r.reason, ?), m.timestamp, m.duration FROM mod_logs m '
+            'JOIN log_actions a ON a.id = m.action_id LEFT JOIN log_reasons r ON r.id = m.reason_id '
+            'WHERE m.guild_id = ? AND m.user_id = ? AND m.id <= ?'
+        )
+        params = (NO_REASON, self.guild_id, user_id, last_id)
+        if since is not None:
+            sql += ' AND m.timestamp >= ?'
+            params += (since,)
+        sql += ' ORDER BY m.timestamp DESC, m.id DESC LIMIT ? OFFSET ?'
+        rows = list(store.iter_rows(sql, params + (HISTORY_PAGE_SIZE, page * HISTORY_PAGE_SIZE)))
+        return [ModLogEntry(*row) for row in reversed(rows)]
+    
+    async def count_warnings(self, user_id):
+        """Count a user's warnings, returns the count and the newest warning's ID, cached like count_mod_logs"""
+        if not store:
+            return 0, 0
+        key = (self.guild_id, user_id, 'warnings')
+        counts = history_counts.get(key)
+        if counts is None:
+            dropped = history_counts.dropped
+            await store.sync()
+            count, last_id = next(store.iter_rows(
+                'SELECT COUNT(*), MAX(id) FROM warnings WHERE guild_id = ? AND user_id = ?', (self.guild_id, user_id)
+            ))
+            counts = count, last_id or 0
+            if history_counts.dropped == dropped:
+                history_counts.set(key, counts)
+        return counts
+    
+    def warning_page(self, user_id, last_id, page):
+        """Read one page of a user's warnings, page 0 holds the newest warnings, oldest first"""
+        if not store:
+            return []
+        rows = list(store.iter_rows(
+            'SELECT reason, mod_id, timestamp FROM warnings WHERE guild_id = ? AND user_id = ? AND id <= ? '
+            'ORDER BY id DESC LIMIT ? OFFSET ?',
+            (self.guild_id, user_id, last_id, HISTORY_PAGE_SIZE, page * HISTORY_PAGE_SIZE)
+        ))
+        return [{'reason': reason, 'mod_id': mod_id, 'timestamp': timestamp} for reason, mod_id, timestamp in reversed(rows)]
+    
+    def get_warning_times(self, user_id):
+        """Get a user's warning timestamps, loading them from disk on first access"""
+        times = self.warning_times.get(user_id)
+        if times is None:
+            times = self.warning_times[user_id] = array('d')
+            if store:
+                rows = store.iter_rows(
+                    'SELECT timestamp FROM warnings WHERE guild_id = ? AND user_id = ? ORDER BY id',
+                    (self.guild_id, user_id)
+                )
+                for (timestamp,) in rows:
+                    times.append(datetime.fromisoformat(timestamp).timestamp())
+            self.size += sys.getsizeof(times)
+        return times
+    
+    def get_warn_counter(self, user_id):
+        """Get a user's rolling warning counter, built from their warnings on first use"""
+        counter = self.warn_counters.get(user_id)
+        if counter is None:
+            counter = self.warn_counters[user_id] = WarnCounter(len(self.escalation.windows))
+            counter.times.extend(self.get_warning_times(user_id))
+        return counter
+    
+    def add_warning(self, user_id, mod_id, reason):
+        """Add a warning to a user
+        
+        Returns their active warning count and the escalation rule the
+        warning triggers, if any.
+        """
+        counter = self.get_warn_counter(user_id)
+        now = time.time()
+        warning = {
+            'reason': reason,
+            'mod_id': mod_id,
+            'timestamp': datetime.fromtimestamp(now).isoformat()
+        }
+        self.warning_times[user_id].append(now)
+        history_counts.pop((self.guild_id, user_id, 'warnings'))
+        counter.times.append(now)
+        self.size += WARNING_TIME_SIZE
+        
+        if store:
+            store.queue(
+                'INSERT INTO warnings (guild_id, user_id, reason, mod_id, timestamp) VALUES (?, ?, ?, ?, ?)',
+                (self.guild_id, user_id, warning['reason'], mod_id, warning['timestamp'])
+            )
+        
+        policy = self.escalation
+        counts = counter.counts(policy.windows, now)
+        return counts[-1], policy.triggered(counts)
+    
+    def is_warning_expired(self, warning, now=None):
+        expiry = self.escalation.windows[-1]
+        return (now or time.time()) - datetime.fromisoformat(warning['timestamp']).timestamp() >= expiry
+    
+    async def get_analytics(self):
+        """Get the guild's analytics aggregates, loading them on first use"""
+        if self.analytics is None and store:
+            # Actions logged before the aggregates were loaded may still be waiting to be written
+            await store.sync()
+        analytics = self.analytics
+        if analytics is None:
+            analytics = self.analytics = GuildAnalytics()
+            for mod_id, stats in self.mod_stats.items():
+                analytics.moderators.add(mod_id, sum(stats.values()))
+            if store:
+                first_day = int(time.time()) // 86400 - ANALYTICS_DAYS + 1
+                rows = store.iter_rows(
+                    'SELECT day, action, mod_id, count FROM action_days WHERE guild_id = ? AND day >= ?',
+                    (self.guild_id, first_day)
+                )
+                for day, action, mod_id, count in rows:
+                    analytics.days.setdefault(day, {})[(action, mod_id)] = count
+                
+                rows = store.iter_rows('SELECT user_id, count, last_action FROM offenders WHERE guild_id = ?', (self.guild_id,))
+                for user_id, count, last_action in rows:
+                    analytics.offenders.add(user_id, count)
+                    analytics.last_offense[user_id] = last_action
+            self.size += analytics.size
+        return analytics
+    
+    def add_mod_action(self, mod_id, action, count=1):
+        """Add action to mod stats"""
+        stats = self._stats_for(mod_id)
+        stats[action] = stats.get(action, 0) + count
+        if self.analytics:
+            self.analytics.moderators.add(mod_id, count)
+        
+        if store:
+            store.queue(
+                'INSERT INTO mod_stats (guild_id, mod_id, action, count) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (guild_id, mod_id, action) DO UPDATE SET count = count + excluded.count',
+                (self.guild_id, mod_id, action, count)
+            )
+    
+    def add_mod_log(self, user_id, action, mod_id, reason=None, duration=None):
+        """Add entry to user's mod log"""
+        self.add_mod_logs([user_id], action, mod_id, reason, duration)
+    
+    def add_mod_logs(self, user_ids, action, mod_id, reason=None, duration=None):
+        """Add the same entry to several users' mod logs as one batch"""
+        reason = reason or NO_REASON
+        stored_reason = reason if reason != NO_REASON else None  # The default reason isn't stored
+        timestamp = int(time.time())
+        
+        day = timestamp // 86400
+        offense = action in OFFENSE_ACTIONS
+        
+        for user_id in user_ids:
+            history_counts.pop((self.guild_id, user_id, 'modlogs'))
+        
+        if self.analytics:
+            self.analytics.record(day, action, mod_id, len(user_ids))
+            if offense:
+                self.analytics.record_offenses(user_ids, timestamp)
+        
+        if self.audit_channel_id:
+            queue_audit_log(self.guild_id, self.audit_channel_id, user_ids, action, mod_id, reason, timestamp, duration)
+        
+        if store:
+            store.queue('INSERT OR IGNORE INTO log_actions (action) VALUES (?)', (action,))
+            if stored_reason:
+                store.queue('INSERT OR IGNORE INTO log_reasons (reason) VALUES (?)', (stored_reason,))
+            store.queue_many(
+                'INSERT INTO mod_logs (guild_id, user_id, action_id, mod_id, reason_id, timestamp, duration) VALUES '
+                '(?, ?, (SELECT id FROM log_actions WHERE action = ?), ?, (SELECT id FROM log_reasons WHERE reason = ?), ?, ?)',
+                [(self.guild_id, user_id, action, mod_id, stored_reason, timestamp, duration) for user_id in user_ids]
+            )
+            store.queue(
+                'INSERT INTO action_days (guild_id, day, action, mod_id, count) VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT (guild_id, day, action, mod_id) DO UPDATE SET count = count + excluded.count',
+                (self.guild_id, day, action, mod_id, len(user_ids))
+            )
+            if offense:
+                store.queue_many(
+                    'INSERT INTO offenders (guild_id, user_id, count, last_action) VALUES (?, ?, 1, ?) '
+                    'ON CONFLICT (guild_id, user_id) DO UPDATE SET count = count + 1, last_action = excluded.last_action',
+                    [(self.guild_id, user_id, timestamp) for user_id in user_ids]
+                )
+
+def get_guild_state(guild_id):
+    """Get the moderation state for a guild, loading it on first use"""
+    state = guild_states.get(guild_id)
+    if state is None:
+        state = guild_states[guild_id] = GuildState(guild_id)
+    state.last_used = time.monotonic()
+    return state
+
+def guild_state_memory():
+    """Estimated bytes held by all loaded guild states"""
+    return sum(state.size for state in guild_states.values())
+
+async def evict_idle_guilds():
+    """Drop idle guild states from memory once their data is on disk"""
+    now = time.monotonic()
+    idle = [guild_id for guild_id, state in guild_states.items() if now - state.last_used >= GUILD_IDLE_TIMEOUT]
+    
+    total = guild_state_memory()
+    if total > GUILD_MEMORY_BUDGET:
+        # Over budget, also evict least recently used guilds until back under it
+        for state in sorted(guild_states.values(), key=lambda state: state.last_used):
+            if total <= GUILD_MEMORY_BUDGET:
+                break
+            if state.guild_id not in idle:
+                idle.append(state.guild_id)
+            total -= state.size
+    
+    if not idle:
+        return 0
+    
+    # Everything queued so far must be committed before the state can be reloaded from disk,
+    # including batches another flush is still writing
+    started = time.monotonic()
+    if store:
+        await store.sync()
+    
+    evicted = 0
+    for guild_id in idle:
+        state = guild_states.get(guild_id)
+        if state and state.last_used < started:
+            del guild_states[guild_id]
+            evicted += 1
+    return evicted
+
+def parse_time(time_str):
+    """Parse time string like '1h', '30m', '5s' into seconds"""
+    if not time_str:
+        return None
+    
+    match = re.match(r'^(\d+)([smhd])$', time_str.lower())
+    if not match:
+        return None
+    
+    value, unit = match.groups()
+    value = int(value)
+    
+    if unit == 's':
+        return value
+    elif unit == 'm':
+        return value * 60
+    elif unit == 'h':
+        return value * 3600
+    elif unit == 'd':
+        return value * 86400
+    
+    return None
+
+class TokenBucket:
+    """Token bucket rate limiter, refilling rate tokens per second up to capacity"""
+    
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+    
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+    
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def try_acquire(self):
+        """Take a token if one is available"""
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+    
+    async def acquire(self):
+        """Wait for a token, returns the seconds spent waiting"""
+        waited = 0
+        while not self.try_acquire():
+            delay = (1 - self.tokens) / self.rate
+            await asyncio.sleep(delay)
+            waited += delay
+        return waited
+
+class TTLCache:
+    """Least recently used cache whose entries also expire after ttl seconds"""
+    
+    __slots__ = ('maxsize', 'ttl', 'data', 'hits', 'misses', 'dropped')
+    
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.data = OrderedDict()  # key -> (value, expires)
+        self.hits = 0
+        self.misses = 0
+        self.dropped = 0
+    
+    def __len__(self):
+        return len(self.data)
+    
+    def get(self, key):
+        """Get a cached value, or None if missing or expired"""
+        item = self.data.get(key)
+        if item is None or item[1] < time.monotonic():
+            if item is not None:
+                del self.data[key]
+            self.misses += 1
+            return None
+        self.data.move_to_end(key)
+        self.hits += 1
+        return item[0]
+    
+    def set(self, key, value):
+        self.data[key] = (value, time.monotonic() + self.ttl)
+        self.data.move_to_end(key)
+        if len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+    
+    def pop(self, key):
+        """Drop a cached value, e.g. once what it was built from changes"""
+        self.data.pop(key, None)
+        self.dropped += 1
+
+render_cache = TTLCache(RENDER_CACHE_SIZE, RENDER_CACHE_TTL)
+history_counts = TTLCache(HISTORY_COUNT_CACHE_SIZE, HISTORY_COUNT_CACHE_TTL)  # (guild_id, user_id, kind) -> counts
+mod_name_cache = TTLCache(MOD_NAME_CACHE_SIZE, MOD_NAME_CACHE_TTL)
+info_cache = TTLCache(INFO_CACHE_SIZE, INFO_CACHE_TTL)
+
+def mod_display_name(mod_id):
+    """Get a moderator's name for log embeds"""
+    name = mod_name_cache.get(mod_id)
+    if name is None:
+        mod = bot.get_user(mod_id)
+        name = mod.name if mod else "Unknown"
+        mod_name_cache.set(mod_id, name)
+    return name
+
+def history_page_count(count):
+    """Number of pages needed for count history entries"""
+    return max(1, -(-count // HISTORY_PAGE_SIZE))
+
+class HistoryPaginator(discord.ui.View):
+    """Previous/next buttons over a paged history
+    
+    render_page(page) is a coroutine building the embed for one page, so
+    only the page being viewed is ever read and formatted.
+    """
+    
+    def __init__(self, author_id, render_page, page_count, page=0):
+        super().__init__(timeout=PAGINATOR_TIMEOUT)
+        self.author_id = author_id
+        self.render_page = render_page
+        self.page_count = page_count
+        self.page = page
+        self.message = None
+        self._update_buttons()
+    
+    def _update_buttons(self):
+        self.newer.disabled = self.page == 0
+        self.older.disabled = self.page >= self.page_count - 1
+    
+    async def interaction_check(self, interaction):
+        if interaction.user.id != self.author_id:
+            await interaction.response.send_message("❌ Only the person who ran this command can change pages.", ephemeral=True)
+            return False
+        return True
+    
+    async def _show(self, interaction):
+        self._update_buttons()
+        await interaction.response.edit_message(embed=await self.render_page(self.page), view=self)
+    
+    @discord.ui.button(label="◀ Newer", style=discord.ButtonStyle.secondary)
+    async def newer(self, interaction, button):
+        self.page = max(self.page - 1, 0)
+        await self._show(interaction)
+    
+    @discord.ui.button(label="Older ▶", style=discord.ButtonStyle.secondary)
+    async def older(self, interaction, button):
+        self.page = min(self.page + 1, self.page_count - 1)
+        await self._show(interaction)
+    
+    async def on_timeout(self):
+        if self.message:
+            try:
+                await self.message.edit(view=None)
+            except discord.HTTPException:
+                pass
+
+async def send_paginated(ctx, render_page, page_count, page=0):
+    """Send a paged history, with buttons if there's more than one page"""
+    page = min(max(page, 0), page_count - 1)
+    if page_count == 1:
+        await ctx.send(embed=await render_page(page))
+        return
+    
+    view = HistoryPaginator(ctx.author.id, render_page, page_count, page)
+    view.message = await ctx.send(embed=await render_page(page), view=view)
+
+class BulkResult:
+    """Outcome of a bulk operation on one target, error is None on success"""
+    
+    __slots__ = ('target', 'error')
+    
+    def __init__(self, target, error=None):
+        self.target = target
+        self.error = error
+
+# Shared by every run_bulk call, Discord's global limit is per bot, so worker processes split it
+bulk_limiter = TokenBucket(BULK_RATE / WORKER_COUNT)
+
+async def run_bulk(targets, operation, bucket=None, concurrency=BULK_CONCURRENCY):
+    """Run operation(target) for every target concurrently
+    
+    At most concurrency calls are in flight, and calls from all bulk
+    operations together start at no more than BULK_RATE per second
+    (see bulk_limiter). bucket maps a target to its Discord rate limit bucket
+    (e.g. the channel ID for channel routes), calls sharing a bucket run
+    one at a time so they queue here instead of hitting 429s.
+    Returns the results in target order and the elapsed seconds.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    bucket_locks = {}
+    
+    async def run(target):
+        lock = bucket_locks.setdefault(bucket(target), asyncio.Lock()) if bucket else None
+        try:
+            if lock:
+                await lock.acquire()
+            async with semaphore:
+                await bulk_limiter.acquire()
+                await operation(target)
+            return BulkResult(target)
+        except discord.HTTPException as e:
+            return BulkResult(target, e.text or str(e.status))
+        except Exception as e:
+            return BulkResult(target, str(e))
+        finally:
+            if lock:
+                lock.release()
+    
+    started = time.perf_counter()
+    results = await asyncio.gather(*[run(target) for target in targets])
+    return results, time.perf_counter() - started
+
+async def set_channels_locked(guild, channels, locked):
+    """Lock or unlock text channels for @everyone concurrently"""
+    send_messages = False if locked else None
+    
+    async def edit(channel):
+        await channel.set_permissions(guild.default_role, send_messages=send_messages)
+    
+    return await run_bulk(channels, edit, bucket=lambda channel: channel.id)
+
+def bulk_channel_embed(title, verb, where, results, elapsed, color):
+    """Summarize a bulk channel operation"""
+    failed = [result for result in results if result.error]
+    done = len(results) - len(failed)
+    
+    embed = discord.Embed(title=title, description=f"{verb} {done}/{len(results)} channels in {where}", color=color)
+    if failed:
+        lines = [f"{result.target.mention}: {result.error}" for result in failed[:10]]
+        if len(failed) > 10:
+            lines.append(f"...and {len(failed) - 10} more")
+        embed.add_field(name=f"Failed ({len(failed)})", value="\n".join(lines), inline=False)
+    embed.set_footer(text=f"Completed in {elapsed:.2f}s")
+    return embed
+
+class PurgeProgress:
+    """Running totals of a purge"""
+    
+    __slots__ = ('scanned', 'matched', 'deleted', 'failed', 'bulk_requests')
+    
+    def __init__(self):
+        self.scanned = 0
+        self.matched = 0
+        self.deleted = 0
+        self.failed = 0
+        self.bulk_requests = 0
+
+async def purge_messages(channel, check, limit, scan_limit, before=None, after=None, report=None):
+    """Delete up to limit messages matching check, newest first
+    
+    History is streamed and filtered as it arrives. Messages under 14 days
+    old are deleted 100 per bulk delete request, older ones can only be
+    deleted one at a time and go through a rate limited worker while the
+    scan carries on. Pinned messages are kept. report(progress) is
+    awaited every PURGE_PROGRESS_INTERVAL seconds.
+    """
+    progress = PurgeProgress()
+    # A minute of margin so messages don't cross the 14 day line while the scan runs
+    bulk_cutoff = discord.utils.utcnow() - timedelta(days=14, minutes=-1)
+    batch = []
+    old_messages = asyncio.Queue(maxsize=100)  # Bounded, so a slow worker pauses the scan
+    
+    async def delete_old():
+        bucket = TokenBucket(PURGE_OLD_RATE, 1)
+        while True:
+            message = await old_messages.get()
+            if message is None:
+                return
+            await bucket.acquire()
+            try:
+                await message.delete()
+                progress.deleted += 1
+            except discord.NotFound:
+                pass
+            except discord.HTTPException:
+                progress.failed += 1
+    
+    async def delete_batch():
+        messages = batch[:]
+        batch.clear()
+        try:
+            await channel.delete_messages(messages, reason="Purge")
+            progress.deleted += len(messages)
+        except discord.HTTPException:
+            progress.failed += len(messages)
+        progress.bulk_requests += 1
+    
+    worker = asyncio.create_task(delete_old())
+    next_report = time.monotonic() + PURGE_PROGRESS_INTERVAL
+    try:
+        history = channel.history(limit=scan_limit, before=before, after=after, oldest_first=False)
+        async for message in history:
+            progress.scanned += 1
+            if not message.pinned and check(message):
+                progress.matched += 1
+                if message.created_at > bulk_cutoff:
+                    batch.append(message)
+                    if len(batch) == 100:
+                        await delete_batch()
+                else:
+                    await old_messages.put(message)
+                if progress.matched >= limit:
+                    break
+            
+            if report and time.monotonic() >= next_report:
+                next_report = time.monotonic() + PURGE_PROGRESS_INTERVAL
+                await report(progress)
+        
+        if batch:
+            await delete_batch()
+        await old_messages.put(None)
+        
+        while not worker.done():
+            try:
+                await asyncio.wait_for(asyncio.shield(worker), timeout=PURGE_PROGRESS_INTERVAL)
+            except asyncio.TimeoutError:
+                if report:
+                    await report(progress)
+    finally:
+        worker.cancel()
+    return progress
+
+REGEX_REPEATS = {regex_parser.MAX_REPEAT, regex_parser.MIN_REPEAT, getattr(regex_parser, 'POSSESSIVE_REPEAT', None)}
+
+def _regex_nodes(items):
+    """Walk a parsed regex, yielding every (op, argument) node"""
+    for op, av in items:
+        yield op, av
+        if op in REGEX_REPEATS:
+            yield from _regex_nodes(av[2])
+        elif op is regex_parser.SUBPATTERN:
+            yield from _regex_nodes(av[3])
+        elif op is regex_parser.BRANCH:
+            for branch in av[1]:
+                yield from _regex_nodes(branch)
+        elif op in (regex_parser.ASSERT, regex_parser.ASSERT_NOT):
+            yield from _regex_nodes(av[1])
+        elif op is regex_parser.GROUPREF_EXISTS:
+            yield from _regex_nodes(av[1])
+            if av[2]:
+                yield from _regex_nodes(av[2])
+        elif op is getattr(regex_parser, 'ATOMIC_GROUP', None):
+            yield from _regex_nodes(av)
+
+def check_purge_pattern(pattern):
+    """Compile a purge match regex, returns the regex and None or None and an error message
+    
+    The regex runs on the event loop against every scanned message, so
+    patterns that can backtrack for a long time are refused: long ones,
+    repeats of something that repeats or branches, backreferences and
+    more than PURGE_PATTERN_REPEATS unbounded repeats.
+    """
+    if len(pattern) > PURGE_PATTERN_LIMIT:
+        return None, f"Pattern is longer than {PURGE_PATTERN_LIMIT} characters"
+    try:
+        regex = re.compile(pattern, re.IGNORECASE)
+    except re.error as e:
+        return None, f"Invalid pattern: {e}"
+    unbounded = 0
+    for op, av in _regex_nodes(regex_parser.parse(pattern, re.IGNORECASE)):
+        if op is regex_parser.GROUPREF or op is regex_parser.GROUPREF_EXISTS:
+            return None, "Backreferences aren't allowed in purge patterns"
+        if op not in REGEX_REPEATS:
+            continue
+        if av[1] == regex_parser.MAXREPEAT:
+            unbounded += 1
+        if any(inner in REGEX_REPEATS or inner is regex_parser.BRANCH for inner, _ in _regex_nodes(av[2])):
+            return None, "Repeating a group that repeats or has alternatives isn't allowed in purge patterns"
+    if unbounded > PURGE_PATTERN_REPEATS:
+        return None, f"Purge patterns can have at most {PURGE_PATTERN_REPEATS} unbounded repeats (*, +, {{n,}})"
+    return regex, None
+
+async def run_purge(ctx, check, limit, scan_limit, description, before=None, after=None):
+    """Run a purge in the current channel, reporting progress in a status message"""
+    started = time.perf_counter()
+    status = await ctx.send(f"🧹 Purging {description}...")
+    
+    async def report(progress):
+        try:
+            await status.edit(content=f"🧹 Purging {description}... scanned {progress.scanned}, deleted {progress.deleted}")
+        except discord.HTTPException:
+            pass
+    
+    progress = await purge_messages(
+        ctx.channel, check, limit, scan_limit,
+        before=before or ctx.message, after=after, report=report
+    )
+    elapsed = time.perf_counter() - started
+    
+    embed = discord.Embed(
+        title="Messages Purged",
+        description=f"Deleted {progress.deleted} {description} in {ctx.channel.mention}",
+        color=0x00ff00 if not progress.failed else 0xff9900
+    )
+    embed.add_field(name="Scanned", value=progress.scanned, inline=True)
+    embed.add_field(name="Bulk Requests", value=progress.bulk_requests, inline=True)
+    if progress.failed:
+        embed.add_field(name="Failed", value=progress.failed, inline=True)
+    embed.add_field(name="Moderator", value=ctx.author.mention, inline=True)
+    embed.set_footer(text=f"Completed in {elapsed:.2f}s")
+    
+    try:
+        await status.edit(content=None, embed=embed)
+    except discord.NotFound:
+        await ctx.send(embed=embed)
+
+# Leading user IDs or mentions, separated by spaces or commas
+LEADING_USER_ID = re.compile(r'[\s,]*(?:<@!?(\d{15,21})>|(\d{15,21}))(?=[\s,]|$)')
+USER_ID = re.compile(r'\d{15,21}')
+
+async def parse_mass_targets(ctx, text):
+    """Split '<user ids...> [reason]' into user IDs and a reason
+    
+    IDs are also read from any text attachments on the message. The
+    invoking moderator and the bot are never included.
+    """
+    user_ids = []
+    pos = 0
+    while True:
+        match = LEADING_USER_ID.match(text, pos)
+        if not match:
+            break
+        user_ids.append(int(match.group(1) or match.group(2)))
+        pos = match.end()
+    reason = text[pos:].strip(' ,') or NO_REASON
+    
+    for attachment in ctx.message.attachments:
+        if attachment.size > 1024 * 1024:
+            continue
+        data = await attachment.read()
+        user_ids += [int(user_id) for user_id in USER_ID.findall(data.decode('utf-8', 'ignore'))]
+    
+    excluded = {ctx.author.id, bot.user.id}
+    user_ids = [user_id for user_id in dict.fromkeys(user_ids) if user_id not in excluded]
+    return user_ids, reason
+
+async def check_mass_targets(ctx, user_ids):
+    """Reply with an error and return False if the target list can't be used"""
+    if not user_ids:
+        await ctx.send("❌ Please provide user IDs or mentions, or attach a file of IDs.")
+        return False
+    if len(user_ids) > MASS_ACTION_LIMIT:
+        await ctx.send(f"❌ Mass actions are limited to {MASS_ACTION_LIMIT} users at a time.")
+        return False
+    return True
+
+def record_mass_action(guild_id, mod_id, done, action, stat, reason, duration=None):
+    """Log a mass action for every affected user and the moderator in one batch"""
+    if not done:
+        return
+    state = get_guild_state(guild_id)
+    state.add_mod_action(mod_id, stat, len(done))
+    state.add_mod_logs(done, action, mod_id, reason, duration)
+
+def mass_action_embed(title, verb, ctx, done, failed, reason, elapsed, color):
+    """Summarize a mass moderation command"""
+    embed = discord.Embed(title=title, description=f"{verb} {len(done)}/{len(done) + len(failed)} users", color=color)
+    embed.add_field(name="Moderator", value=ctx.author.mention, inline=True)
+    embed.add_field(name="Reason", value=reason, inline=True)
+    if failed:
+        lines = [f"{user_id}: {error}" for user_id, error in failed[:10]]
+        if len(failed) > 10:
+            lines.append(f"...and {len(failed) - 10} more")
+        embed.add_field(name=f"Failed ({len(failed)})", value="\n".join(lines), inline=False)
+    rate = len(done) / elapsed if elapsed > 0 else 0
+    embed.set_footer(text=f"Completed in {elapsed:.2f}s ({rate:.1f} actions/s)")
+    return embed
+
+def split_bulk_results(results):
+    """Split run_bulk results into succeeded IDs and (ID, error) failures"""
+    done = [result.target for result in results if not result.error]
+    failed = [(result.target, result.error) for result in results if result.error]
+    return done, failed
+
+async def bulk_ban_users(guild, user_ids, audit_reason):
+    """Ban users by ID, using the bulk ban endpoint when available
+    
+    The bulk endpoint also needs Manage Server, without it (or once it's
+    refused) the remaining users are banned one at a time.
+    Returns the banned IDs and (ID, error) failures.
+    """
+    done, failed = [], []
+    remaining = list(user_ids)
+    if hasattr(guild, 'bulk_ban') and guild.me.guild_permissions.manage_guild:
+        while remaining:
+            chunk = [discord.Object(id=user_id) for user_id in remaining[:BULK_BAN_SIZE]]
+            try:
+                result = await guild.bulk_ban(chunk, reason=audit_reason, delete_message_seconds=0)
+            except discord.Forbidden:
+                break
+            except discord.HTTPException as e:
+                failed += [(user.id, e.text or str(e.status)) for user in chunk]
+            else:
+                done += [user.id for user in result.banned]
+                failed += [(user.id, "Could not ban") for user in result.failed]
+            del remaining[:BULK_BAN_SIZE]
+    
+    if remaining:
+        async def ban_one(user_id):
+            await guild.ban(discord.Object(id=user_id), reason=audit_reason, delete_message_seconds=0)
+        results, _ = await run_bulk(remaining, ban_one)
+        single_done, single_failed = split_bulk_results(results)
+        done += single_done
+        failed += single_failed
+    return done, failed
+
+async def bulk_timeout_members(guild, user_ids, seconds, audit_reason):
+    """Timeout members by ID concurrently, returns the muted IDs and (ID, error) failures"""
+    until = discord.utils.utcnow() + timedelta(seconds=seconds)
+    
+    async def mute_one(user_id):
+        member = guild.get_member(user_id) or await guild.fetch_member(user_id)
+        await member.timeout(until, reason=audit_reason)
+    
+    results, _ = await run_bulk(user_ids, mute_one)
+    return split_bulk_results(results)
+
+class Histogram:
+    """Fixed bucket histogram of durations in seconds"""
+    
+    BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+    
+    __slots__ = ('counts', 'count', 'total')
+    
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS) + 1)  # Last bucket is +Inf
+        self.count = 0
+        self.total = 0.0
+    
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.BUCKETS, value)] += 1
+        self.count += 1
+        self.total += value
+    
+    def percentile(self, q):
+        """Estimate the q-th quantile (0-1) by interpolating within its bucket"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                if index == len(self.BUCKETS):
+                    return self.BUCKETS[-1]
+                low = self.BUCKETS[index - 1] if index else 0.0
+                return low + (self.BUCKETS[index] - low) * (rank - seen) / count
+            seen += count
+        return self.BUCKETS[-1]
+
+class CommandPerf:
+    """Timing for one command, api is the time spent in Discord API calls per invocation"""
+    
+    __slots__ = ('latency', 'api', 'errors')
+    
+    def __init__(self):
+        self.latency = Histogram()
+        self.api = Histogram()
+        self.errors = 0
+
+class Invocation:
+    """Timing state for the command currently running"""
+    
+    __slots__ = ('started', 'api_time', 'api_calls')
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.api_time = 0.0
+        self.api_calls = 0
+
+command_perf = {}  # command name -> CommandPerf
+api_perf = {}  # 'METHOD /route' -> Histogram
+loop_lag = Histogram()
+temp_role_lateness = Histogram()
+perf_counters = {
+    'rate_limit_waits': 0, 'rate_limit_seconds': 0.0, 'temp_role_overruns': 0,
+    'audit_messages': 0, 'audit_embeds': 0, 'audit_dropped': 0, 'audit_failed': 0,
+    'limiter_allowed': 0, 'limiter_user_limited': 0, 'limiter_guild_limited': 0,
+}
+current_invocation = contextvars.ContextVar('current_invocation', default=None)
+
+def record_rate_limit_wait(seconds):
+    perf_counters['rate_limit_waits'] += 1
+    perf_counters['rate_limit_seconds'] += seconds
+
+class RateLimitLogHandler(logging.Handler):
+    """Counts the 429 retries discord.py logs, it handles the waits itself"""
+    
+    def emit(self, record):
+        if record.levelno == logging.WARNING and str(record.msg).startswith('We are being rate limited') and record.args:
+            record_rate_limit_wait(record.args[-1])
+
+logging.getLogger('discord.http').addHandler(RateLimitLogHandler())
+
+def instrument_http(http):
+    """Time every Discord API request, per route and per running command"""
+    request = http.request
+    
+    async def timed_request(route, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await request(route, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            histogram = api_perf.get(route.key)
+            if histogram is None:
+                histogram = api_perf[route.key] = Histogram()
+            histogram.observe(elapsed)
+            
+            invocation = current_invocation.get()
+            if invocation:
+                invocation.api_time += elapsed
+                invocation.api_calls += 1
+    
+    http.request = timed_request
+
+instrument_http(bot.http)
+
+def get_command_perf(name):
+    stats = command_perf.get(name)
+    if stats is None:
+        stats = command_perf[name] = CommandPerf()
+    return stats
+
+# COMMAND LIMITS
+
+class CommandRateLimited(commands.CheckFailure):
+    """Raised when a user or guild has run out of command tokens"""
+    
+    def __init__(self, scope, retry_after):
+        self.scope = scope
+        self.retry_after = retry_after
+        super().__init__(f"{scope} command rate limit, retry in {retry_after:.1f}s")
+
+# An idle bucket refills completely, so buckets are only kept until then and recreated full
+user_buckets = TTLCache(100000, COMMAND_USER_BURST / COMMAND_USER_RATE)
+guild_buckets = TTLCache(10000, COMMAND_GUILD_BURST / COMMAND_GUILD_RATE)
+limit_notices = TTLCache(10000, COMMAND_LIMIT_NOTICE)
+
+def take_command_token(buckets, key, rate, burst):
+    """Take a token from key's bucket, returns 0 or the seconds until one is available"""
+    bucket = buckets.data.get(key)
+    if bucket is None:
+        bucket = TokenBucket(rate, burst)
+    else:
+        bucket = bucket[0]
+    allowed = bucket.try_acquire()
+    # Store again either way so the entry lives until the bucket would be full
+    buckets.set(key, bucket)
+    return 0 if allowed else (1 - bucket.tokens) / rate
+
+@bot.check
+async def command_rate_limit(ctx):
+    """Token bucket limits for every command, per user and per guild
+    
+    Moderators are exempt, during a raid they need to act back to back and
+    a burst of member commands mustn't lock them out.
+    """
+    if ctx.guild:
+        permissions = ctx.channel.permissions_for(ctx.author)
+        if (permissions.manage_messages or permissions.kick_members or permissions.ban_members
+                or permissions.moderate_members):
+            perf_counters['limiter_allowed'] += 1
+            return True
+    
+    retry_after = take_command_token(user_buckets, ctx.author.id, COMMAND_USER_RATE, COMMAND_USER_BURST)
+    if retry_after:
+        perf_counters['limiter_user_limited'] += 1
+        raise CommandRateLimited('user', retry_after)
+    if ctx.guild:
+        retry_after = take_command_token(guild_buckets, ctx.guild.id, COMMAND_GUILD_RATE, COMMAND_GUILD_BURST)
+        if retry_after:
+            perf_counters['limiter_guild_limited'] += 1
+            raise CommandRateLimited('guild', retry_after)
+    perf_counters['limiter_allowed'] += 1
+    return True
+
+@bot.before_invoke
+async def start_command_timer(ctx):
+    ctx.invocation = Invocation()
+    current_invocation.set(ctx.invocation)
+
+@bot.after_invoke
+async def record_command_timing(ctx):
+    invocation = getattr(ctx, 'invocation', None)
+    if invocation is None:
+        return
+    stats = get_command_perf(ctx.command.qualified_name)
+    stats.latency.observe(time.perf_counter() - invocation.started)
+    stats.api.observe(invocation.api_time)
+    current_invocation.set(None)
+
+@bot.event
+async def on_command_error(ctx, error):
+    if isinstance(error, commands.CommandNotFound) and await load_command_extension(ctx.invoked_with):
+        # The command's extension wasn't loaded yet, run it again now that it is
+        await bot.invoke(await bot.get_context(ctx.message))
+        return
+    if isinstance(error, CommandRateLimited):
+        # Reply once per notice interval per user or guild, replying to every rejected command would defeat the limit
+        key = ctx.author.id if error.scope == 'user' else ('guild', ctx.guild.id)
+        if limit_notices.get(key) is None:
+            limit_notices.set(key, True)
+            await ctx.send(f"⏳ Slow down, try again in {math.ceil(error.retry_after)}s.", delete_after=COMMAND_LIMIT_NOTICE)
+        return
+    if ctx.command:
+        get_command_perf(ctx.command.qualified_name).errors += 1
+    print(f"Ignoring exception in command {ctx.command}:", file=sys.stderr)
+    traceback.print_exception(type(error), error, error.__traceback__, file=sys.stderr)
+
+async def loop_lag_monitor():
+    """Sample how late the event loop wakes up a sleeping task"""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        loop_lag.observe(max(loop.time() - started - LOOP_LAG_INTERVAL, 0.0))
+
+def state_sizes():
+    """Sizes of the in-memory data structures"""
+    return {
+        'guild_states': len(guild_states),
+        'guild_state_bytes': guild_state_memory(),
+        'temp_roles': len(temp_roles),
+        'temp_role_heap': len(temp_role_heap),
+        'role_persist': len(role_persist),
+        'role_sets': len(role_sets),
+        'member_counts': len(member_counts),
+        'audit_queued': sum(audit.queue.qsize() for audit in audit_queues.values()),
+        'render_cache': len(render_cache),
+        'mod_name_cache': len(mod_name_cache),
+        'info_cache': len(info_cache),
+        'user_buckets': len(user_buckets),
+        'guild_buckets': len(guild_buckets),
+        'pending_writes': len(store.pending) if store else 0,
+    }
+
+def _prometheus_histogram(lines, name, labels, histogram):
+    for bound, count in zip(Histogram.BUCKETS, itertools.accumulate(histogram.counts)):
+        lines.append(f'{name}_bucket{{{labels}le="{bound}"}} {count}')
+    lines.append(f'{name}_bucket{{{labels}le="+Inf"}} {histogram.count}')
+    labels = labels.rstrip(',')
+    lines.append(f'{name}_sum{{{labels}}} {histogram.total}')
+    lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+
+def prometheus_metrics():
+    """Render all metrics in the Prometheus text format"""
+    lines = ['# TYPE modbot_command_seconds histogram']
+    for name, stats in command_perf.items():
+        _prometheus_histogram(lines, 'modbot_command_seconds', f'command="{name}",', stats.latency)
+    lines.append('# TYPE modbot_command_api_seconds histogram')
+    for name, stats in command_perf.items():
+        _prometheus_histogram(lines, 'modbot_command_api_seconds', f'command="{name}",', stats.api)
+    lines.append('# TYPE modbot_command_errors_total counter')
+    for name, stats in command_perf.items():
+        lines.append(f'modbot_command_errors_total{{command="{name}"}} {stats.errors}')
+    lines.append('# TYPE modbot_api_seconds histogram')
+    for route, histogram in api_perf.items():
+        _prometheus_histogram(lines, 'modbot_api_seconds', f'route="{route}",', histogram)
+    lines.append('# TYPE modbot_loop_lag_seconds histogram')
+    _prometheus_histogram(lines, 'modbot_loop_lag_seconds', '', loop_lag)
+    lines.append('# TYPE modbot_temp_role_lateness_seconds histogram')
+    _prometheus_histogram(lines, 'modbot_temp_role_lateness_seconds', '', temp_role_lateness)
+    lines.append('# TYPE modbot_temp_role_overruns_total counter')
+    lines.append(f'modbot_temp_role_overruns_total {perf_counters["temp_role_overruns"]}')
+    lines.append('# TYPE modbot_rate_limit_waits_total counter')
+    lines.append(f'modbot_rate_limit_waits_total {perf_counters["rate_limit_waits"]}')
+    lines.append('# TYPE modbot_rate_limit_wait_seconds_total counter')
+    lines.append(f'modbot_rate_limit_wait_seconds_total {perf_counters["rate_limit_seconds"]}')
+    lines.append('# TYPE modbot_audit_messages_total counter')
+    lines.append(f'modbot_audit_messages_total {perf_counters["audit_messages"]}')
+    lines.append('# TYPE modbot_audit_embeds_total counter')
+    for outcome, key in (('posted', 'audit_embeds'), ('dropped', 'audit_dropped'), ('failed', 'audit_failed')):
+        lines.append(f'modbot_audit_embeds_total{{outcome="{outcome}"}} {perf_counters[key]}')
+    lines.append('# TYPE modbot_command_limiter_total counter')
+    for outcome, key in (('allowed', 'limiter_allowed'), ('user_limited', 'limiter_user_limited'), ('guild_limited', 'limiter_guild_limited')):
+        lines.append(f'modbot_command_limiter_total{{outcome="{outcome}"}} {perf_counters[key]}')
+    lines.append('# TYPE modbot_cache_requests_total counter')
+    for name, cache in (('render', render_cache), ('mod_name', mod_name_cache), ('info', info_cache)):
+        lines.append(f'modbot_cache_requests_total{{cache="{name}",result="hit"}} {cache.hits}')
+        lines.append(f'modbot_cache_requests_total{{cache="{name}",result="miss"}} {cache.misses}')
+    lines.append('# TYPE modbot_startup_seconds gauge')
+    for stage, seconds in startup_timings.items():
+        lines.append(f'modbot_startup_seconds{{stage="{stage}"}} {seconds}')
+    lines.append('# TYPE modbot_state_size gauge')
+    for name, size in state_sizes().items():
+        lines.append(f'modbot_state_size{{name="{name}"}} {size}')
+    return '\n'.join(lines) + '\n'
+
+async def start_metrics_server(port):
+    """Serve /metrics on localhost"""
+    global metrics_runner
+    
+    async def metrics(request):
+        return web.Response(text=prometheus_metrics(), content_type='text/plain')
+    
+    app = web.Application()
+    app.router.add_get('/metrics', metrics)
+    metrics_runner = web.AppRunner(app)
+    await metrics_runner.setup()
+    await web.TCPSite(metrics_runner, '127.0.0.1', port).start()
+    print(f'Serving metrics on http://127.0.0.1:{port}/metrics')
+
+# AUDIT LOG
+
+AUDIT_COLORS = {'kick': 0xff9900, 'ban': 0xff0000, 'mute': 0xffff00, 'warn': 0xffa500, 'unmute': 0x00ff00, 'unban': 0x00ff00}
+AUDIT_USER_LIST = 40  # Users listed in one audit embed for a mass action
+
+class AuditQueue:
+    """Audit log embeds waiting to be posted to one guild's audit channel"""
+    
+    __slots__ = ('channel_id', 'queue', 'dropped', 'task')
+    
+    def __init__(self, channel_id):
+        self.channel_id = channel_id
+        self.queue = asyncio.Queue(maxsize=AUDIT_QUEUE_LIMIT)
+        self.dropped = 0  # Dropped since the last post, reported with the next one
+        self.task = None
+
+audit_queues = {}  # guild_id -> AuditQueue
+
+def audit_embed(user_ids, action, mod_id, reason, timestamp, duration):
+    """Build the audit log embed for one add_mod_logs call, a mass action gets a single embed"""
+    embed = discord.Embed(
+        title=f"{action.title()}" if len(user_ids) == 1 else f"Mass {action.title()} ({len(user_ids)} users)",
+        color=AUDIT_COLORS.get(action, 0x3498db),
+        timestamp=datetime.fromtimestamp(timestamp, timezone.utc)
+    )
+    users = ', '.join(f"<@{user_id}>" for user_id in user_ids[:AUDIT_USER_LIST])
+    if len(user_ids) > AUDIT_USER_LIST:
+        users += f" and {len(user_ids) - AUDIT_USER_LIST} more"
+    embed.add_field(name="User" if len(user_ids) == 1 else "Users", value=users, inline=False)
+    embed.add_field(name="Moderator", value=f"<@{mod_id}>", inline=True)
+    if duration:
+        embed.add_field(name="Duration", value=duration, inline=True)
+    embed.add_field(name="Reason", value=reason[:1024], inline=False)
+    return embed
+
+def queue_audit_log(guild_id, channel_id, user_ids, action, mod_id, reason, timestamp, duration):
+    """Queue a mod log entry for the guild's audit channel, dropping it if the queue is full"""
+    audit = audit_queues.get(guild_id)
+    if audit is None or audit.channel_id != channel_id:
+        audit = audit_queues[guild_id] = AuditQueue(channel_id)
+    
+    if audit.queue.full():
+        audit.dropped += 1
+        perf_counters['audit_dropped'] += 1
+        return
+    audit.queue.put_nowait(audit_embed(user_ids, action, mod_id, reason, timestamp, duration))
+    
+    if audit.task is None or audit.task.done():
+        audit.task = asyncio.create_task(audit_log_worker(guild_id, audit))
+
+async def audit_log_worker(guild_id, audit):
+    """Post queued audit embeds, up to 10 per message
+    
+    Embeds are collected for AUDIT_FLUSH_DELAY first so a burst goes out
+    in a few messages. Posting is paced at AUDIT_POST_RATE, anything
+    arriving beyond AUDIT_QUEUE_LIMIT meanwhile is dropped and reported.
+    """
+    queue = audit.queue
+    bucket = TokenBucket(AUDIT_POST_RATE, 1)
+    held = None  # Embed that didn't fit in the previous message
+    while held or not queue.empty():
+        if queue.qsize() < 10:
+            await asyncio.sleep(AUDIT_FLUSH_DELAY)
+        await bucket.acquire()
+        
+        # Up to 10 embeds per message, within Discord's 6000 character total
+        embeds = [held] if held else []
+        characters = len(held) if held else 0
+        held = None
+        while not queue.empty() and len(embeds) < 10:
+            embed = queue.get_nowait()
+            if embeds and characters + len(embed) > 6000:
+                held = embed
+                break
+            embeds.append(embed)
+            characters += len(embed)
+        
+        content = None
+        if audit.dropped:
+            content = f"⚠️ {audit.dropped} audit log entries were dropped because the queue was full."
+            audit.dropped = 0
+        
+        channel = bot.get_channel(audit.channel_id)
+        if channel is None:
+            # The channel is gone, nothing queued for it can be posted
+            perf_counters['audit_failed'] += len(embeds) + bool(held) + queue.qsize()
+            held = None
+            while not queue.empty():
+                queue.get_nowait()
+            break
+        try:
+            await channel.send(content=content, embeds=embeds)
+            perf_counters['audit_messages'] += 1
+            perf_counters['audit_embeds'] += len(embeds)
+        except discord.HTTPException as e:
+            perf_counters['audit_failed'] += len(embeds)
+            print(f"Error posting audit log: {e}")
+    
+    if audit_queues.get(guild_id) is audit and queue.empty():
+        del audit_queues[guild_id]
+
+# SHARDING
+
+class LocalBackend:
+    """Cross-shard coordination when one process runs every shard
+    
+    Every guild is local, so cross-shard tasks just run here.
+    """
+    
+    workers = 1
+    
+    def owns_guild(self, guild_id):
+        return True
+    
+    async def start(self):
+        pass
+    
+    async def broadcast(self, kind, payload):
+        """Run a task against every worker's guilds, returns each worker's result"""
+        return [await shard_task_handlers[kind](payload)]
 
-def parse_time(time_str):
-    """Parse time string like '1h', '30m', '5s' into seconds"""
-    if not time_str:
-        return None
+class SQLiteBackend(LocalBackend):
+    """Cross-shard coordination between worker processes through the shared database
     
-    match = re.match(r'^(\d+)([smhd])$', time_str.lower())
-    if not match:
-        return None
+    Each worker owns a range of shards and so the guilds on them, guild
+    state stays in the owning worker's memory like with a single process.
+    Cross-shard tasks are rows in shard_tasks that every worker polls for,
+    runs against its own guilds and answers in shard_results.
+    """
     
-    value, unit = match.groups()
-    value = int(value)
+    def __init__(self, shard_ids, shard_count, workers):
+        self.shard_ids = set(shard_ids)
+        self.shard_count = shard_count
+        self.workers = workers
+        self.name = f"{min(shard_ids)}-{max(shard_ids)}"
+        self.started = time.time()
+        self.handled = set()  # IDs of the tasks still in the poll window this worker has picked up
+        self.poll_task = None
     
-    if unit == 's':
-        return value
-    elif unit == 'm':
-        return value * 60
-    elif unit == 'h':
-        return value * 3600
-    elif unit == 'd':
-        return value * 86400
+    def owns_guild(self, guild_id):
+        return (guild_id >> 22) % self.shard_count in self.shard_ids
     
-    return None
+    async def start(self):
+        if self.poll_task is None or self.poll_task.done():
+            self.poll_task = asyncio.create_task(self.poll())
+    
+    async def poll(self):
+        while True:
+            try:
+                await asyncio.sleep(SHARD_POLL_INTERVAL)
+                since = max(self.started, time.time() - SHARD_TASK_TTL)
+                rows = list(store.iter_rows('SELECT id, kind, payload FROM shard_tasks WHERE created >= ? ORDER BY id', (since,)))
+                for task_id, kind, payload in rows:
+                    if task_id not in self.handled:
+                        self.handled.add(task_id)
+                        asyncio.create_task(self.run_task(task_id, kind, payload))
+                # Tasks that left the window never come back, and their IDs can be reused once deleted
+                self.handled.intersection_update(task_id for task_id, _, _ in rows)
+            except Exception as e:
+                print(f"Error polling shard tasks: {e}")
+    
+    async def run_task(self, task_id, kind, payload):
+        try:
+            result = await shard_task_handlers[kind](json.loads(payload))
+        except Exception as e:
+            result = {'error': str(e)}
+        store.queue(
+            'INSERT OR REPLACE INTO shard_results (task_id, worker, result) VALUES (?, ?, ?)',
+            (task_id, self.name, json.dumps(result))
+        )
+        await store.flush()
+    
+    async def broadcast(self, kind, payload):
+        """Run a task on every worker, returns the results that arrive within SHARD_TASK_TIMEOUT"""
+        now = time.time()
+        store.queue(
+            'DELETE FROM shard_results WHERE task_id IN (SELECT id FROM shard_tasks WHERE created < ?)',
+            (now - SHARD_TASK_TTL,)
+        )
+        store.queue('DELETE FROM shard_tasks WHERE created < ?', (now - SHARD_TASK_TTL,))
+        task_id = await store.insert(
+            'INSERT INTO shard_tasks (kind, payload, created) VALUES (?, ?, ?)',
+            (kind, json.dumps(payload), now)
+        )
+        
+        deadline = time.monotonic() + SHARD_TASK_TIMEOUT
+        while True:
+            await asyncio.sleep(SHARD_POLL_INTERVAL)
+            rows = list(store.iter_rows('SELECT result FROM shard_results WHERE task_id = ?', (task_id,)))
+            if len(rows) >= self.workers or time.monotonic() >= deadline:
+                return [json.loads(result) for (result,) in rows]
 
-def add_mod_action(mod_id, action):
-    """Add action to mod stats"""
-    if mod_id not in mod_stats:
-        mod_stats[mod_id] = {'kicks': 0, 'bans': 0, 'mutes': 0, 'warns': 0, 'other': 0}
+async def shard_unban(payload):
+    """Unban a user from every guild on this worker's shards"""
+    user = discord.Object(id=payload['user_id'])
+    not_banned = []
     
-    if action in mod_stats[mod_id]:
-        mod_stats[mod_id][action] += 1
-    else:
-        mod_stats[mod_id]['other'] += 1
-
-def add_mod_log(user_id, action, mod_id, reason=None, duration=None):
-    """Add entry to user's mod log"""
-    if user_id not in mod_logs:
-        mod_logs[user_id] = []
-    
-    log_entry = {
-        'action': action,
-        'mod_id': mod_id,
-        'reason': reason or 'No reason provided',
-        'timestamp': datetime.now().isoformat(),
-        'duration': duration
-    }
+    async def unban_one(guild):
+        try:
+            await guild.unban(user, reason=payload['audit_reason'])
+        except discord.NotFound:
+            not_banned.append(guild)
+            raise
+    
+    guilds = [guild for guild in bot.guilds if guild.me.guild_permissions.ban_members]
+    results, _ = await run_bulk(guilds, unban_one)
+    done, failed = split_bulk_results(results)
+    
+    for guild in done:
+        state = get_guild_state(guild.id)
+        state.add_mod_action(payload['mod_id'], 'unbans')
+        state.add_mod_log(user.id, 'unban', payload['mod_id'], payload['reason'])
+    return {'unbanned': len(done), 'not_banned': len(not_banned), 'failed': len(failed) - len(not_banned)}
+
+shard_task_handlers = {'unban': shard_unban}
+
+if WORKER_COUNT > 1 and SHARD_IDS:
+    backend = SQLiteBackend(SHARD_IDS, SHARD_COUNT, WORKER_COUNT)
+else:
+    backend = LocalBackend()
+
+async def recommended_shard_count(token):
+    """Ask Discord how many shards the bot should run"""
+    http = discord.http.HTTPClient(asyncio.get_running_loop())
+    try:
+        await http.static_login(token)
+        shard_count, _, _ = await http.get_bot_gateway()
+        return shard_count
+    finally:
+        await http.close()
+
+def launch_workers(token, processes, shard_count=None):
+    """Run the bot as several worker processes, each with a contiguous range of shards"""
+    if not shard_count:
+        shard_count = asyncio.run(recommended_shard_count(token))
+    processes = min(processes, shard_count)
+    per_worker, extra = divmod(shard_count, processes)
+    
+    workers = []
+    first = 0
+    try:
+        for index in range(processes):
+            count = per_worker + (index < extra)
+            shard_ids = range(first, first + count)
+            first += count
+            env = dict(
+                os.environ,
+                MODBOT_SHARD_IDS=','.join(map(str, shard_ids)),
+                MODBOT_SHARD_COUNT=str(shard_count),
+                MODBOT_WORKERS=str(processes),
+                MODBOT_WORKER=str(index),
+            )
+            print(f"Starting worker {index} with shards {shard_ids.start}-{shard_ids.stop - 1} of {shard_count}")
+            workers.append(subprocess.Popen([sys.executable, os.path.abspath(__file__)], env=env))
+            if index < processes - 1:
+                # Workers identify their shards one after another, stagger them so they don't overlap
+                time.sleep(count * SHARD_IDENTIFY_DELAY)
+        for worker in workers:
+            worker.wait()
+    finally:
+        for worker in workers:
+            if worker.poll() is None:
+                worker.terminate()
+        for worker in workers:
+            worker.wait()
+
+# STARTUP
+
+async def load_command_extension(name):
+    """Load the extension providing a command, returns True if it wasn't loaded before"""
+    extension = LAZY_COMMANDS.get(name)
+    if extension is None or extension in bot.extensions:
+        return False
+    async with extension_lock:
+        if extension in bot.extensions:
+            return True
+        started = time.perf_counter()
+        await bot.load_extension(extension)
+        print(f"Loaded {extension} in {(time.perf_counter() - started) * 1000:.1f}ms")
+    return True
+
+async def load_extensions():
+    """Load every extension not loaded yet"""
+    for names in EXTENSIONS.values():
+        await load_command_extension(names[0])
+    startup_timings.setdefault('extensions', time.perf_counter() - PROCESS_STARTED)
+
+def _chunk_done(guild_id, task):
+    chunk_tasks.pop(guild_id, None)
+    if not task.cancelled() and task.exception() is None:
+        # Counters built before the chunk only saw part of the members, get_member_counts rebuilds them
+        member_counts.pop(guild_id, None)
+
+async def ensure_chunked(guild):
+    """Fetch a guild's full member list the first time it's needed"""
+    if guild.chunked:
+        return
+    task = chunk_tasks.get(guild.id)
+    if task is None:
+        task = chunk_tasks[guild.id] = asyncio.create_task(guild.chunk(cache=True))
+        task.add_done_callback(lambda task: _chunk_done(guild.id, task))
+    await asyncio.shield(task)
+
+def needs_members():
+    """Command check that chunks the guild first, for commands that read its whole member list"""
+    async def predicate(ctx):
+        if ctx.guild:
+            await ensure_chunked(ctx.guild)
+        return True
+    return commands.check(predicate)
+
+async def chunk_guilds_handler():
+    """Chunk the guilds nobody has used yet in the background, one at a time
     
-    mod_logs[user_id].append(log_entry)
+    Member events for members missing from the cache (e.g. on_member_remove,
+    which role persistence needs) only arrive once their guild is chunked.
+    """
+    for guild in list(bot.guilds):
+        if guild.chunked or not bot.get_guild(guild.id):
+            continue
+        try:
+            await ensure_chunked(guild)
+        except Exception as e:
+            print(f"Error chunking guild {guild.id}: {e}")
+    startup_timings.setdefault('chunked', time.perf_counter() - PROCESS_STARTED)
 
 @bot.event
 async def on_ready():
-    print(f'{bot.user} is now online!')
+    if 'ready' not in startup_timings:
+        startup_timings['ready'] = time.perf_counter() - PROCESS_STARTED
+        print(f'{bot.user} is now online! Ready in {startup_timings["ready"]:.2f}s')
+    else:
+        print(f'{bot.user} is now online!')
     print(f'Loaded in {len(bot.guilds)} servers')
     
-    # Start background tasks
-    bot.loop.create_task(temp_role_handler())
+    # Start background tasks (on_ready fires again after reconnects)
+    global temp_role_task, data_flush_task, guild_sweep_task, member_recount_task, loop_lag_task
+    global chunk_task, extension_task
+    if extension_task is None:
+        extension_task = bot.loop.create_task(load_extensions())
+    if chunk_task is None or chunk_task.done():
+        chunk_task = bot.loop.create_task(chunk_guilds_handler())
+    if temp_role_task is None or temp_role_task.done():
+        temp_role_task = bot.loop.create_task(temp_role_handler())
+    if store and (data_flush_task is None or data_flush_task.done()):
+        data_flush_task = bot.loop.create_task(data_flush_handler())
+    if guild_sweep_task is None or guild_sweep_task.done():
+        guild_sweep_task = bot.loop.create_task(guild_state_sweeper())
+    if member_recount_task is None or member_recount_task.done():
+        member_recount_task = bot.loop.create_task(member_recount_handler())
+    if loop_lag_task is None or loop_lag_task.done():
+        loop_lag_task = bot.loop.create_task(loop_lag_monitor())
+    await backend.start()
+    if METRICS_PORT and metrics_runner is None:
+        try:
+            # Each worker process serves its own metrics on the next port up
+            await start_metrics_server(int(METRICS_PORT) + WORKER_INDEX)
+        except Exception as e:
+            print(f"Error starting metrics server: {e}")
+
+def schedule_temp_role(guild_id, user_id, role_id, expires):
+    """Schedule a temporary role for removal at the given expiry time"""
+    key = (guild_id, user_id, role_id)
+    temp_roles[key] = {'expires': expires}
+    heapq.heappush(temp_role_heap, (expires, key))
+    
+    if store:
+        store.queue(
+            'INSERT OR REPLACE INTO temp_roles (guild_id, user_id, role_id, expires) VALUES (?, ?, ?, ?)',
+            (guild_id, user_id, role_id, expires.timestamp())
+        )
+    
+    # Wake the handler if this is now the soonest deadline
+    if temp_role_heap[0][1] == key:
+        temp_role_wakeup.set()
+
+def cancel_temp_role(guild_id, user_id, role_id):
+    """Cancel a scheduled temporary role, returns True if one was pending"""
+    # The heap entry is left in place and skipped once it reaches the top
+    if temp_roles.pop((guild_id, user_id, role_id), None) is None:
+        return False
+    _delete_temp_role_row(guild_id, user_id, role_id)
+    return True
+
+def _delete_temp_role_row(guild_id, user_id, role_id):
+    if store:
+        store.queue(
+            'DELETE FROM temp_roles WHERE guild_id = ? AND user_id = ? AND role_id = ?',
+            (guild_id, user_id, role_id)
+        )
+
+def _is_stale_temp_role(entry):
+    expires, key = entry
+    data = temp_roles.get(key)
+    return data is None or data['expires'] != expires
+
+def _compact_temp_role_heap():
+    """Drop cancelled/rescheduled entries once they outnumber the live ones"""
+    if len(temp_role_heap) > 2 * len(temp_roles) + 64:
+        temp_role_heap[:] = [entry for entry in temp_role_heap if not _is_stale_temp_role(entry)]
+        heapq.heapify(temp_role_heap)
 
 async def temp_role_handler():
     """Handle temporary role removal"""
     while True:
         try:
-            current_time = datetime.now()
-            expired_roles = []
+            while temp_role_heap and _is_stale_temp_role(temp_role_heap[0]):
+                heapq.heappop(temp_role_heap)
             
-            for key, data in temp_roles.items():
-                if current_time >= data['expires']:
-                    expired_roles.append(key)
+            if temp_role_heap:
+                delay = (temp_role_heap[0][0] - datetime.now()).total_seconds()
+            else:
+                delay = None  # Nothing scheduled, sleep until temprole adds something
             
-            for key in expired_roles:
+            if delay is None or delay > 0:
+                temp_role_wakeup.clear()
                 try:
-                    guild_id, user_id, role_id = map(int, key.split('_'))
-                    guild = bot.get_guild(guild_id)
-                    if guild:
-                        user = guild.get_member(user_id)
-                        role = guild.get_role(role_id)
-                        if user and role:
-                            await user.remove_roles(role, reason="Temporary role expired")
-                    del temp_roles[key]
-                except Exception as e:
-                    print(f"Error removing temp role: {e}")
-                    del temp_roles[key]
+                    await asyncio.wait_for(temp_role_wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
             
-            await asyncio.sleep(60)  # Check every minute
+            expires, key = heapq.heappop(temp_role_heap)
+            lateness = (datetime.now() - expires).total_seconds()
+            temp_role_lateness.observe(lateness)
+            if lateness > TEMP_ROLE_OVERRUN:
+                perf_counters['temp_role_overruns'] += 1
+            del temp_roles[key]
+            _compact_temp_role_heap()
+            
+            guild_id, user_id, role_id = key
+            _delete_temp_role_row(guild_id, user_id, role_id)
+            try:
+                guild = bot.get_guild(guild_id)
+                if guild:
+                    user = guild.get_member(user_id)
+                    if user is None and not guild.chunked:
+                        try:
+                            user = await guild.fetch_member(user_id)
+                        except discord.NotFound:
+                            pass
+                    role = guild.get_role(role_id)
+                    if user and role:
+                        await user.remove_roles(role, reason="Temporary role expired")
+                    elif not user:
+                        # They left while the role was active, don't give it back when they return
+                        forget_persisted_role(guild_id, user_id, role_id)
+            except Exception as e:
+                print(f"Error removing temp role: {e}")
         except Exception as e:
             print(f"Error in temp role handler: {e}")
-            await asyncio.sleep(60)
+            await asyncio.sleep(1)
 
-# MODERATION COMMANDS
+async def data_flush_handler():
+    """Periodically commit queued writes to disk"""
+    while True:
+        try:
+            await asyncio.sleep(FLUSH_INTERVAL)
+            await store.flush()
+            if time.monotonic() - store.last_checkpoint >= CHECKPOINT_INTERVAL:
+                await store.checkpoint()
+        except Exception as e:
+            print(f"Error flushing data: {e}")
 
-@bot.command()
-@commands.has_permissions(kick_members=True)
-async def kick(ctx, member: discord.Member, *, reason="No reason provided"):
-    """Kick a member"""
-    try:
-        await member.kick(reason=f"Kicked by {ctx.author} | {reason}")
-        
-        embed = discord.Embed(title="Member Kicked", color=0xff9900)
-        embed.add_field(name="User", value=f"{member} ({member.id})", inline=False)
-        embed.add_field(name="Moderator", value=ctx.author.mention, inline=True)
-        embed.add_field(name="Reason", value=reason, inline=True)
-        
-        await ctx.send(embed=embed)
-        
-        add_mod_action(ctx.author.id, 'kicks')
-        add_mod_log(member.id, 'kick', ctx.author.id, reason)
-        
-    except discord.Forbidden:
-        await ctx.send("❌ I don't have permission to kick this user.")
-    except Exception as e:
-        await ctx.send(f"❌ Error: {e}")
+async def guild_state_sweeper():
+    """Periodically evict idle guild state"""
+    while True:
+        try:
+            await asyncio.sleep(GUILD_SWEEP_INTERVAL)
+            await evict_idle_guilds()
+            prune_automod_activity()
+            prune_join_monitors()
+            prune_role_persist()
+        except Exception as e:
+            print(f"Error evicting guild state: {e}")
 
-@bot.command()
-@commands.has_permissions(ban_members=True)
-async def ban(ctx, member: discord.Member, *, reason="No reason provided"):
-    """Ban a member"""
-    try:
-        await member.ban(reason=f"Banned by {ctx.author} | {reason}")
-        
-        embed = discord.Embed(title="Member Banned", color=0xff0000)
-        embed.add_field(name="User", value=f"{member} ({member.id})", inline=False)
-        embed.add_field(name="Moderator", value=ctx.author.mention, inline=True)
-        embed.add_field(name="Reason", value=reason, inline=True)
-        
-        await ctx.send(embed=embed)
-        
-        add_mod_action(ctx.author.id, 'bans')
-        add_mod_log(member.id, 'ban', ctx.author.id, reason)
-        
-    except discord.Forbidden:
-        await ctx.send("❌ I don't have permission to ban this user.")
-    except Exception as e:
-        await ctx.send(f"❌ Error: {e}")
+class MemberCounts:
+    """Human, bot and per-role member counts for a guild, kept up to date from member events"""
+    
+    __slots__ = ('humans', 'bots', 'roles')
+    
+    def __init__(self):
+        self.humans = 0
+        self.bots = 0
+        self.roles = {}  # role_id -> member count, @everyone excluded
+    
+    def add(self, member, sign=1):
+        if member.bot:
+            self.bots += sign
+        else:
+            self.humans += sign
+        for role in member.roles:
+            if not role.is_default():
+                self.roles[role.id] = self.roles.get(role.id, 0) + sign
+    
+    def remove(self, member):
+        self.add(member, -1)
+    
+    def update_roles(self, before, after):
+        old = {role.id for role in before.roles}
+        new = {role.id for role in after.roles}
+        for role_id in new - old:
+            self.roles[role_id] = self.roles.get(role_id, 0) + 1
+        for role_id in old - new:
+            self.roles[role_id] = self.roles.get(role_id, 0) - 1
 
-@bot.command()
-@commands.has_permissions(moderate_members=True)
-async def mute(ctx, member: discord.Member, duration: str = None, *, reason="No reason provided"):
-    """Mute a member using Discord timeout"""
-    if not duration:
-        await ctx.send("❌ Please specify duration (e.g., 10m, 1h, 1d)")
-        return
+member_counts = {}  # guild_id -> MemberCounts
+
+def get_member_counts(guild):
+    """Get a guild's member counters, counting once if they haven't been built yet"""
+    counts = member_counts.get(guild.id)
+    if counts is None:
+        counts = member_counts[guild.id] = MemberCounts()
+        for member in guild.members:
+            counts.add(member)
+    return counts
+
+async def recount_members(guild):
+    """Rebuild a guild's member counters without stalling the event loop
     
-    seconds = parse_time(duration)
-    if not seconds:
-        await ctx.send("❌ Invalid time format. Use: 10s, 5m, 2h, 1d")
+    Events that arrive mid-scan may be missed, the next recount corrects them.
+    Guilds that aren't chunked yet are skipped, their member cache is partial.
+    """
+    if not guild.chunked:
         return
+    counts = MemberCounts()
+    for i, member in enumerate(guild.members, 1):
+        counts.add(member)
+        if i % MEMBER_RECOUNT_BATCH == 0:
+            await asyncio.sleep(0)
+    if bot.get_guild(guild.id):
+        member_counts[guild.id] = counts
+
+async def member_recount_handler():
+    """Periodically reconcile member counters with the member cache"""
+    while True:
+        try:
+            for guild in bot.guilds:
+                await recount_members(guild)
+        except Exception as e:
+            print(f"Error recounting members: {e}")
+        await asyncio.sleep(MEMBER_RECOUNT_INTERVAL)
+
+@bot.event
+async def on_member_join(member):
+    counts = member_counts.get(member.guild.id)
+    if counts:
+        counts.add(member)
     
-    if seconds > 2419200:  # 28 days max
-        await ctx.send("❌ Maximum timeout duration is 28 days.")
-        return
+    if not member.bot:
+        check_raid_join(member)
+        await restore_roles(member)
+
+@bot.event
+async def on_member_remove(member):
+    counts = member_counts.get(member.guild.id)
+    if counts:
+        counts.remove(member)
     
-    try:
-        until = discord.utils.utcnow() + timedelta(seconds=seconds)
-        await member.timeout(until, reason=f"Muted by {ctx.author} | {reason}")
-        
-        embed = discord.Embed(title="Member Muted", color=0xffff00)
-        embed.add_field(name="User", value=f"{member} ({member.id})", inline=False)
-        embed.add_field(name="Duration", value=duration, inline=True)
-        embed.add_field(name="Moderator", value=ctx.author.mention, inline=True)
-        embed.add_field(name="Reason", value=reason, inline=False)
-        
-        await ctx.send(embed=embed)
-        
-        add_mod_action(ctx.author.id, 'mutes')
-        add_mod_log(member.id, 'mute', ctx.author.id, reason, duration)
-        
-    except discord.Forbidden:
-        await ctx.send("❌ I don't have permission to timeout this user.")
-    except Exception as e:
-        await ctx.send(f"❌ Error: {e}")
+    if not member.bot:
+        snapshot_roles(member)
 
-@bot.command()
-@commands.has_permissions(moderate_members=True)
-async def unmute(ctx, member: discord.Member, *, reason="No reason provided"):
-    """Unmute a member"""
-    try:
-        await member.timeout(None, reason=f"Unmuted by {ctx.author} | {reason}")
-        
-        embed = discord.Embed(title="Member Unmuted", color=0x00ff00)
-        embed.add_field(name="User", value=f"{member} ({member.id})", inline=False)
-        embed.add_field(name="Moderator", value=ctx.author.mention, inline=True)
-        embed.add_field(name="Reason", value=reason, inline=True)
-        
-        await ctx.send(embed=embed)
-        add_mod_log(member.id, 'unmute', ctx.author.id, reason)
-        
-    except discord.Forbidden:
-        await ctx.send("❌ I don't have permission to remove timeout from this user.")
-    except Exception as e:
-        await ctx.send(f"❌ Error: {e}")
+@bot.event
+async def on_member_update(before, after):
+    counts = member_counts.get(after.guild.id)
+    if counts and before.roles != after.roles:
+        counts.update_roles(before, after)
 
-@bot.command()
-@commands.has_permissions(ban_members=True)
-async def unban(ctx, user_id: int, *, reason="No reason provided"):
-    """Unban a user by ID"""
-    try:
-        user = await bot.fetch_user(user_id)
-        await ctx.guild.unban(user, reason=f"Unbanned by {ctx.author} | {reason}")
-        
-        embed = discord.Embed(title="User Unbanned", color=0x00ff00)
-        embed.add_field(name="User", value=f"{user} ({user.id})", inline=False)
-        embed.add_field(name="Moderator", value=ctx.author.mention, inline=True)
-        embed.add_field(name="Reason", value=reason, inline=True)
-        
-        await ctx.send(embed=embed)
-        add_mod_log(user.id, 'unban', ctx.author.id, reason)
-        
-    except discord.NotFound:
-        await ctx.send("❌ User not found or not banned.")
-    except discord.Forbidden:
-        await ctx.send("❌ I don't have permission to unban users.")
-    except Exception as e:
-        await ctx.send(f"❌ Error: {e}")
+@bot.event
+async def on_guild_join(guild):
+    await recount_members(guild)
 
-@bot.command()
-@commands.has_permissions(kick_members=True)
-async def warn(ctx, member: discord.Member, *, reason="No reason provided"):
-    """Warn a member"""
-    if member.id not in warnings:
-        warnings[member.id] = []
-    
-    warning = {
-        'reason': reason,
-        'mod_id': ctx.author.id,
-        'timestamp': datetime.now().isoformat()
-    }
+@bot.event
+async def on_guild_remove(guild):
+    member_counts.pop(guild.id, None)
+
+@bot.event
+async def on_guild_role_delete(role):
+    counts = member_counts.get(role.guild.id)
+    if counts:
+        counts.roles.pop(role.id, None)
+
+def record_warning(guild_id, member_id, mod_id, reason):
+    """Store a warning with its mod stats and log entry
     
-    warnings[member.id].append(warning)
+    Returns the active warning count and the escalation rule triggered, if any.
+    """
+    state = get_guild_state(guild_id)
+    warning_count, rule = state.add_warning(member_id, mod_id, reason)
+    state.add_mod_action(mod_id, 'warns')
+    state.add_mod_log(member_id, 'warn', mod_id, reason)
+    return warning_count, rule
+
+async def timeout_member(member, seconds, moderator, reason, duration):
+    """Timeout a member and record it, raises discord.HTTPException on failure"""
+    until = discord.utils.utcnow() + timedelta(seconds=seconds)
+    await member.timeout(until, reason=f"Muted by {moderator} | {reason}")
     
-    embed = discord.Embed(title="Member Warned", color=0xffa500)
-    embed.add_field(name="User", value=f"{member} ({member.id})", inline=False)
-    embed.add_field(name="Warning Count", value=len(warnings[member.id]), inline=True)
-    embed.add_field(name="Moderator", value=ctx.author.mention, inline=True)
-    embed.add_field(name="Reason", value=reason, inline=False)
+    state = get_guild_state(member.guild.id)
+    state.add_mod_action(moderator.id, 'mutes')
+    state.add_mod_log(member.id, 'mute', moderator.id, reason, duration)
+
+async def kick_member(member, moderator, reason):
+    """Kick a member and record it, raises discord.HTTPException on failure"""
+    await member.kick(reason=f"Kicked by {moderator} | {reason}")
     
-    await ctx.send(embed=embed)
+    state = get_guild_state(member.guild.id)
+    state.add_mod_action(moderator.id, 'kicks')
+    state.add_mod_log(member.id, 'kick', moderator.id, reason)
+
+async def ban_member(member, moderator, reason):
+    """Ban a member and record it, raises discord.HTTPException on failure"""
+    await member.ban(reason=f"Banned by {moderator} | {reason}")
     
-    add_mod_action(ctx.author.id, 'warns')
-    add_mod_log(member.id, 'warn', ctx.author.id, reason)
+    state = get_guild_state(member.guild.id)
+    state.add_mod_action(moderator.id, 'bans')
+    state.add_mod_log(member.id, 'ban', moderator.id, reason)
 
-@bot.command()
-async def warnings(ctx, member: discord.Member = None):
-    """Check warnings for a user"""
-    if not member:
-        member = ctx.author
+async def apply_escalation(member, rule):
+    """Carry out an escalation rule through the regular mute/kick/ban paths
     
-    if member.id not in warnings or not warnings[member.id]:
-        await ctx.send(f"{member} has no warnings.")
-        return
+    Returns what happened to the member, raises discord.HTTPException on failure.
+    """
+    reason = f"Escalation: {rule.trigger}"
+    if rule.action == 'mute':
+        await timeout_member(member, rule.seconds, bot.user, reason, rule.duration)
+        return f"muted for {rule.duration}"
+    if rule.action == 'kick':
+        await kick_member(member, bot.user, reason)
+        return "kicked"
+    await ban_member(member, bot.user, reason)
+    return "banned"
+
+# AUTO MODERATION
+
+class RollingCounter:
+    """Counts events per key over a sliding time window, len() is the total in the window"""
     
-    embed = discord.Embed(title=f"Warnings for {member}", color=0xff6b6b)
-    embed.set_thumbnail(url=member.display_avatar.url)
+    __slots__ = ('window', 'events', 'counts')
     
-    for i, warning in enumerate(warnings[member.id], 1):
-        mod = bot.get_user(warning['mod_id'])
-        mod_name = mod.name if mod else "Unknown"
-        date = datetime.fromisoformat(warning['timestamp']).strftime('%Y-%m-%d %H:%M')
-        
-        embed.add_field(
-            name=f"Warning {i}",
-            value=f"**Reason:** {warning['reason']}\n**Moderator:** {mod_name}\n**Date:** {date}",
-            inline=False
-        )
+    def __init__(self, window):
+        self.window = window
+        self.events = deque()  # (time, key) oldest first
+        self.counts = {}
     
-    await ctx.send(embed=embed)
-
-@bot.command()
-async def modstats(ctx, member: discord.Member = None):
-    """Check moderation statistics"""
-    if not member:
-        member = ctx.author
+    def __len__(self):
+        return len(self.events)
     
-    if member.id not in mod_stats:
-        await ctx.send(f"{member} has no moderation actions recorded.")
-        return
+    def expire(self, now):
+        cutoff = now - self.window
+        events = self.events
+        while events and events[0][0] <= cutoff:
+            key = events.popleft()[1]
+            count = self.counts[key] - 1
+            if count:
+                self.counts[key] = count
+            else:
+                del self.counts[key]
     
-    stats = mod_stats[member.id]
-    total = sum(stats.values())
+    def add(self, now, key):
+        """Record an event, returns how many events with this key are in the window"""
+        self.expire(now)
+        self.events.append((now, key))
+        count = self.counts[key] = self.counts.get(key, 0) + 1
+        return count
+
+class UserActivity:
+    """Recent messages of one user, keyed by content hash"""
     
-    embed = discord.Embed(title=f"Moderation Stats for {member}", color=0x3498db)
-    embed.set_thumbnail(url=member.display_avatar.url)
-    embed.add_field(name="Kicks", value=stats.get('kicks', 0), inline=True)
-    embed.add_field(name="Bans", value=stats.get('bans', 0), inline=True)
-    embed.add_field(name="Mutes", value=stats.get('mutes', 0), inline=True)
-    embed.add_field(name="Warnings", value=stats.get('warns', 0), inline=True)
-    embed.add_field(name="Other", value=stats.get('other', 0), inline=True)
-    embed.add_field(name="Total Actions", value=total, inline=True)
+    __slots__ = ('messages', 'last_action')
     
-    await ctx.send(embed=embed)
+    def __init__(self):
+        self.messages = RollingCounter(AUTOMOD_WINDOW)
+        self.last_action = 0.0
 
-@bot.command()
-async def modlogs(ctx, member: discord.Member = None):
-    """Check moderation logs for a user"""
-    if not member:
-        member = ctx.author
+user_activity = {}  # (guild_id, user_id) -> UserActivity
+channel_activity = {}  # channel_id -> RollingCounter of content hashes
+flood_slowmodes = set()  # channel IDs with automod slowmode applied
+
+def automod_check(config, message, now):
+    """Find the first automod rule a message breaks
     
-    if member.id not in mod_logs or not mod_logs[member.id]:
-        await ctx.send(f"{member} has no moderation history.")
-        return
+    Returns (rule, reason) or None. Rules are 'word', 'link', 'duplicate',
+    'spam' and 'flood', the last one applies to the channel rather than
+    the author. Copies of a long message from several users count towards
+    a flood, never towards one user's duplicates.
+    """
+    content = message.content
+    if config.matcher and content:
+        match = config.matcher.search(content)
+        if match:
+            if match.lastgroup == 'word':
+                return 'word', "Used a banned word"
+            return 'link', "Posted a link"
     
-    logs = mod_logs[member.id][-10:]  # Show last 10 entries
+    # Hash the normalized content so trivially varied copies count as duplicates
+    normalized = ' '.join(content.lower().split())
+    key = hash(normalized) if normalized else None
+    channel_key = key if len(normalized) >= AUTOMOD_CHANNEL_DUPLICATE_LENGTH else None
     
-    embed = discord.Embed(title=f"Moderation Logs for {member}", color=0xe74c3c)
-    embed.set_thumbnail(url=member.display_avatar.url)
+    activity = user_activity.get((message.guild.id, message.author.id))
+    if activity is None:
+        activity = user_activity[(message.guild.id, message.author.id)] = UserActivity()
+    user_duplicates = activity.messages.add(now, key)
     
-    for log in logs:
-        mod = bot.get_user(log['mod_id'])
-        mod_name = mod.name if mod else "Unknown"
-        date = datetime.fromisoformat(log['timestamp']).strftime('%Y-%m-%d %H:%M')
-        
-        field_value = f"**Moderator:** {mod_name}\n**Reason:** {log['reason']}\n**Date:** {date}"
-        if log.get('duration'):
-            field_value += f"\n**Duration:** {log['duration']}"
-        
-        embed.add_field(
-            name=f"{log['action'].title()}",
-            value=field_value,
-            inline=False
-        )
+    channel = channel_activity.get(message.channel.id)
+    if channel is None:
+        channel = channel_activity[message.channel.id] = RollingCounter(AUTOMOD_WINDOW)
+    channel_duplicates = channel.add(now, channel_key)
     
-    await ctx.send(embed=embed)
+    if len(activity.messages) > AUTOMOD_SPAM_LIMIT:
+        return 'spam', "Sending messages too quickly"
+    if key is not None and user_duplicates >= AUTOMOD_DUPLICATE_LIMIT:
+        return 'duplicate', "Repeated message"
+    if message.channel.id not in flood_slowmodes:
+        if len(channel) > AUTOMOD_FLOOD_LIMIT:
+            return 'flood', "Channel flood"
+        if channel_key is not None and channel_duplicates >= AUTOMOD_CHANNEL_DUPLICATE_LIMIT:
+            return 'flood', "Repeated message flood"
+    return None
 
-@bot.command()
-@commands.has_permissions(manage_channels=True)
-async def slowmode(ctx, channel: discord.TextChannel = None, delay: str = None):
-    """Set or check slowmode"""
-    if not channel:
-        channel = ctx.channel
-    
-    if not delay:
-        current = channel.slowmode_delay
-        if current == 0:
-            await ctx.send(f"{channel.mention} has no slowmode.")
-        else:
-            await ctx.send(f"{channel.mention} slowmode: {current} seconds")
+async def lift_flood_slowmode(channel):
+    await asyncio.sleep(AUTOMOD_FLOOD_SLOWMODE_DURATION)
+    try:
+        if channel.slowmode_delay == AUTOMOD_FLOOD_SLOWMODE:
+            await channel.edit(slowmode_delay=0, reason="Automod: flood slowmode expired")
+    except discord.HTTPException as e:
+        print(f"Error lifting flood slowmode: {e}")
+    finally:
+        flood_slowmodes.discard(channel.id)
+
+async def automod_act(message, rule, reason):
+    """Carry out the action for a broken automod rule"""
+    member = message.author
+    channel = message.channel
+    
+    if rule == 'flood':
+        if channel.slowmode_delay:
+            return
+        flood_slowmodes.add(channel.id)
+        await channel.edit(slowmode_delay=AUTOMOD_FLOOD_SLOWMODE, reason=f"Automod: {reason}")
+        await channel.send(f"🐢 Slowmode set to {AUTOMOD_FLOOD_SLOWMODE}s due to a message flood.", delete_after=30)
+        asyncio.create_task(lift_flood_slowmode(channel))
+        return
+    
+    if rule != 'spam':
+        try:
+            await message.delete()
+        except discord.NotFound:
+            pass
+    
+    # One warn/mute per user per cooldown, so a burst doesn't cause a burst of actions
+    activity = user_activity.get((message.guild.id, member.id))
+    now = time.monotonic()
+    if activity is None or now - activity.last_action < AUTOMOD_ACTION_COOLDOWN:
         return
+    activity.last_action = now
     
-    seconds = parse_time(delay)
-    if seconds is None:
-        await ctx.send("❌ Invalid time format. Use: 10s, 5m, etc.")
+    reason = f"Automod: {reason}"
+    if rule == 'spam':
+        duration = f"{AUTOMOD_SPAM_MUTE // 60}m"
+        await timeout_member(member, AUTOMOD_SPAM_MUTE, bot.user, reason, duration)
+        await channel.send(f"🔇 {member.mention} was muted for {duration} ({reason})", delete_after=10)
+    else:
+        warning_count, rule = record_warning(message.guild.id, member.id, bot.user.id, reason)
+        await channel.send(f"⚠️ {member.mention} has been warned ({reason}), warning #{warning_count}", delete_after=10)
+        if rule:
+            done = await apply_escalation(member, rule)
+            await channel.send(f"⛔ {member.mention} was {done} ({rule.trigger})", delete_after=10)
+
+@bot.listen('on_message')
+async def automod_on_message(message):
+    if message.guild is None or message.author.bot or not isinstance(message.author, discord.Member):
         return
     
-    if seconds > 21600:  # 6 hours max
-        await ctx.send("❌ Maximum slowmode is 6 hours.")
+    # Not get_guild_state, chat alone shouldn't load a guild or keep it from being evicted
+    config = automod_configs.get(message.guild.id)
+    if config is None or not config.enabled or message.author.guild_permissions.manage_messages:
         return
     
-    try:
-        await channel.edit(slowmode_delay=seconds)
-        if seconds == 0:
-            await ctx.send(f"✅ Slowmode disabled for {channel.mention}")
-        else:
-            await ctx.send(f"✅ Slowmode set to {delay} for {channel.mention}")
-    except discord.Forbidden:
-        await ctx.send("❌ I don't have permission to edit this channel.")
+    hit = automod_check(config, message, time.monotonic())
+    if hit:
+        try:
+            await automod_act(message, *hit)
+        except discord.HTTPException as e:
+            print(f"Error applying automod action: {e}")
 
-@bot.command()
-@commands.has_permissions(manage_channels=True)
-async def lock(ctx, channel: discord.TextChannel = None):
-    """Lock a channel"""
-    if not channel:
-        channel = ctx.channel
+def prune_automod_activity():
+    """Drop activity counters with nothing left in their window"""
+    now = time.monotonic()
+    for key, activity in list(user_activity.items()):
+        activity.messages.expire(now)
+        if not activity.messages and now - activity.last_action >= AUTOMOD_ACTION_COOLDOWN:
+            del user_activity[key]
+    for channel_id, counter in list(channel_activity.items()):
+        counter.expire(now)
+        if not counter:
+            del channel_activity[channel_id]
+
+# ROLE PERSISTENCE
+
+class RoleSnapshot:
+    """Roles a member had when they left, expires is in epoch seconds"""
     
-    try:
-        await channel.set_permissions(ctx.guild.default_role, send_messages=False)
-        embed = discord.Embed(title="Channel Locked", description=f"{channel.mention} has been locked.", color=0xff0000)
-        await ctx.send(embed=embed)
-    except discord.Forbidden:
-        await ctx.send("❌ I don't have permission to edit this channel.")
+    __slots__ = ('roles', 'expires')
+    
+    def __init__(self, roles, expires):
+        self.roles = roles  # Shared array('Q') from intern_role_set
+        self.expires = expires
 
-@bot.command()
-@commands.has_permissions(manage_channels=True)
-async def unlock(ctx, channel: discord.TextChannel = None):
-    """Unlock a channel"""
-    if not channel:
-        channel = ctx.channel
+def intern_role_set(role_ids):
+    """Get the shared array for a set of role IDs, members with the same roles share one array"""
+    roles = array('Q', sorted(set(role_ids)))
+    packed = roles.tobytes()
+    entry = role_sets.get(packed)
+    if entry is None:
+        entry = role_sets[packed] = [roles, 0]
+    entry[1] += 1
+    return entry[0]
+
+def release_role_set(roles):
+    packed = roles.tobytes()
+    entry = role_sets[packed]
+    entry[1] -= 1
+    if not entry[1]:
+        del role_sets[packed]
+
+def _drop_role_snapshot(key):
+    snapshot = role_persist.pop(key, None)
+    if snapshot:
+        release_role_set(snapshot.roles)
+    return snapshot
+
+def snapshot_roles(member):
+    """Remember a leaving member's roles so they can be restored if they rejoin"""
+    key = (member.guild.id, member.id)
+    _drop_role_snapshot(key)
+    role_ids = [role.id for role in member.roles if not role.is_default() and not role.managed]
     
-    try:
-        await channel.set_permissions(ctx.guild.default_role, send_messages=None)
-        embed = discord.Embed(title="Channel Unlocked", description=f"{channel.mention} has been unlocked.", color=0x00ff00)
-        await ctx.send(embed=embed)
-    except discord.Forbidden:
-        await ctx.send("❌ I don't have permission to edit this channel.")
+    if not role_ids:
+        store.queue('DELETE FROM role_persist WHERE guild_id = ? AND user_id = ?', key)
+        return
+    
+    # Every snapshot gets the same TTL, so appending keeps role_persist in expiry order
+    expires = time.time() + ROLE_PERSIST_TTL
+    role_persist[key] = RoleSnapshot(intern_role_set(role_ids), expires)
+    store.queue(
+        'INSERT OR REPLACE INTO role_persist (guild_id, user_id, role_ids, expires) VALUES (?, ?, ?, ?)',
+        (*key, ','.join(map(str, role_ids)), expires)
+    )
 
-@bot.command()
-@commands.has_permissions(manage_channels=True)
-async def lockall(ctx):
-    """Lock all channels in current category"""
-    category = ctx.channel.category
-    if not category:
-        await ctx.send("❌ This channel is not in a category.")
+async def restore_roles(member):
+    """Give a rejoining member back the roles they had when they left"""
+    key = (member.guild.id, member.id)
+    snapshot = _drop_role_snapshot(key)
+    if snapshot is None:
+        return
+    store.queue('DELETE FROM role_persist WHERE guild_id = ? AND user_id = ?', key)
+    if snapshot.expires <= time.time():
         return
     
-    locked_count = 0
-    for channel in category.channels:
-        if isinstance(channel, discord.TextChannel):
-            try:
-                await channel.set_permissions(ctx.guild.default_role, send_messages=False)
-                locked_count += 1
-            except:
-                pass
+    guild = member.guild
+    top_role = guild.me.top_role
+    roles = [
+        role for role in map(guild.get_role, snapshot.roles)
+        if role and not role.managed and role < top_role
+    ]
+    if not roles:
+        return
     
-    embed = discord.Embed(title="Category Locked", description=f"Locked {locked_count} channels in {category.name}", color=0xff0000)
-    await ctx.send(embed=embed)
+    try:
+        # Non-atomic add_roles sends the whole role list in one request
+        await member.add_roles(*roles, reason="Restoring roles from before they left", atomic=False)
+    except discord.HTTPException as e:
+        print(f"Error restoring roles: {e}")
 
-@bot.command()
-@commands.has_permissions(manage_channels=True)
-async def unlockall(ctx):
-    """Unlock all channels in current category"""
-    category = ctx.channel.category
-    if not category:
-        await ctx.send("❌ This channel is not in a category.")
+def forget_persisted_role(guild_id, user_id, role_id):
+    """Remove one role from a departed member's snapshot"""
+    key = (guild_id, user_id)
+    snapshot = role_persist.get(key)
+    if snapshot is None or role_id not in snapshot.roles:
         return
     
-    unlocked_count = 0
-    for channel in category.channels:
-        if isinstance(channel, discord.TextChannel):
-            try:
-                await channel.set_permissions(ctx.guild.default_role, send_messages=None)
-                unlocked_count += 1
-            except:
-                pass
+    role_ids = [other for other in snapshot.roles if other != role_id]
+    release_role_set(snapshot.roles)
+    if not role_ids:
+        del role_persist[key]
+        store.queue('DELETE FROM role_persist WHERE guild_id = ? AND user_id = ?', key)
+        return
     
-    embed = discord.Embed(title="Category Unlocked", description=f"Unlocked {unlocked_count} channels in {category.name}", color=0x00ff00)
-    await ctx.send(embed=embed)
+    snapshot.roles = intern_role_set(role_ids)
+    store.queue(
+        'UPDATE role_persist SET role_ids = ? WHERE guild_id = ? AND user_id = ?',
+        (','.join(map(str, role_ids)), *key)
+    )
 
-@bot.command()
-@commands.has_permissions(manage_messages=True)
-async def say(ctx, *, message):
-    """Make the bot say something"""
-    await ctx.message.delete()
-    await ctx.send(message)
+def prune_role_persist():
+    """Drop expired role snapshots, oldest first"""
+    now = time.time()
+    expired = 0
+    while role_persist:
+        key = next(iter(role_persist))
+        if role_persist[key].expires > now:
+            break
+        _drop_role_snapshot(key)
+        expired += 1
+    if expired:
+        store.queue('DELETE FROM role_persist WHERE expires <= ?', (now,))
 
-@bot.command()
-@commands.has_permissions(manage_roles=True)
-async def temprole(ctx, member: discord.Member, role: discord.Role, duration: str):
-    """Give a temporary role"""
-    seconds = parse_time(duration)
-    if not seconds:
-        await ctx.send("❌ Invalid time format. Use: 10m, 1h, 1d")
+# RAID PROTECTION
+
+def name_skeleton(name):
+    """Reduce a username to its letters, so 'raider123' and 'Raider_77' cluster together"""
+    return NON_LETTERS.sub('', name.lower())[:16] or '#'
+
+NON_LETTERS = re.compile(r'[^a-z]+')
+RAID_ACTION_VERBS = {'timeout': 'timed out', 'ban': 'banned'}
+
+class JoinMonitor:
+    """Recent joins to a guild and its raid mode state"""
+    
+    __slots__ = (
+        'joins', 'new_accounts', 'names', 'recent', 'raid_until', 'raid_task',
+        'queue', 'queue_task', 'saved_slowmodes', 'actioned'
+    )
+    
+    def __init__(self):
+        self.joins = RollingCounter(RAID_WINDOW)
+        self.new_accounts = RollingCounter(RAID_WINDOW)
+        self.names = RollingCounter(RAID_WINDOW)  # Keyed by name skeleton
+        self.recent = deque()  # (time, member_id, new_account, skeleton) within the window
+        self.raid_until = 0.0
+        self.raid_task = None
+        self.queue = []  # Suspicious member IDs waiting to be actioned
+        self.queue_task = None
+        self.saved_slowmodes = {}  # channel_id -> slowmode before the raid
+        self.actioned = 0
+    
+    @property
+    def raid_active(self):
+        return self.raid_task is not None and not self.raid_task.done()
+    
+    def is_suspicious(self, new_account, skeleton):
+        return new_account or self.names.counts.get(skeleton, 0) >= RAID_NAME_CLUSTER
+
+join_monitors = {}  # guild_id -> JoinMonitor
+
+def check_raid_join(member):
+    """Count a join and start or extend raid mode if the joins look like a raid
+    
+    Everything here is O(1) per join, the recent joins are only scanned
+    once when a raid starts.
+    """
+    monitor = join_monitors.get(member.guild.id)
+    if monitor is None:
+        monitor = join_monitors[member.guild.id] = JoinMonitor()
+    
+    now = time.monotonic()
+    new_account = (discord.utils.utcnow() - member.created_at).total_seconds() < RAID_NEW_ACCOUNT_AGE
+    skeleton = name_skeleton(member.name)
+    
+    joins = monitor.joins.add(now, None)
+    if new_account:
+        monitor.new_accounts.add(now, None)
+    else:
+        monitor.new_accounts.expire(now)
+    cluster = monitor.names.add(now, skeleton)
+    
+    recent = monitor.recent
+    recent.append((now, member.id, new_account, skeleton))
+    while recent[0][0] <= now - RAID_WINDOW:
+        recent.popleft()
+    
+    if monitor.raid_active:
+        if monitor.is_suspicious(new_account, skeleton):
+            monitor.raid_until = now + RAID_MODE_DURATION
+            queue_raid_suspect(member.guild, monitor, member.id)
         return
     
+    new_account_flood = joins >= RAID_JOIN_LIMIT and len(monitor.new_accounts) >= joins * RAID_NEW_ACCOUNT_SHARE
+    if new_account_flood or cluster >= RAID_NAME_CLUSTER:
+        start_raid_mode(member.guild, monitor, "Join flood of new accounts" if new_account_flood else "Join flood of similar names")
+
+def start_raid_mode(guild, monitor, reason):
+    """Enter raid mode and queue the suspicious accounts that already joined"""
+    monitor.raid_until = time.monotonic() + RAID_MODE_DURATION
+    monitor.raid_task = asyncio.create_task(run_raid_mode(guild, monitor, reason))
+    for _, member_id, new_account, skeleton in monitor.recent:
+        if monitor.is_suspicious(new_account, skeleton):
+            queue_raid_suspect(guild, monitor, member_id)
+
+async def notify_raid(guild, message):
+    channel = guild.system_channel
+    if channel:
+        try:
+            await channel.send(message)
+        except discord.HTTPException:
+            pass
+
+async def run_raid_mode(guild, monitor, reason):
+    """Slow every channel down until the raid has been quiet for RAID_MODE_DURATION"""
+    await notify_raid(guild, f"🚨 **Raid detected** ({reason}). Slowmode is on and new suspicious accounts will be {RAID_ACTION_VERBS[RAID_ACTION]} automatically.")
+    
     try:
-        await member.add_roles(role, reason=f"Temporary role by {ctx.author}")
-        
-        expires = datetime.now() + timedelta(seconds=seconds)
-        key = f"{ctx.guild.id}_{member.id}_{role.id}"
-        temp_roles[key] = {'expires': expires}
-        
-        embed = discord.Embed(title="Temporary Role Added", color=0x00ff00)
-        embed.add_field(name="User", value=member.mention, inline=True)
-        embed.add_field(name="Role", value=role.mention, inline=True)
-        embed.add_field(name="Duration", value=duration, inline=True)
+        # Inside the try so a raid ended mid-rollout still restores the channels already slowed
+        channels = [channel for channel in guild.text_channels if channel.slowmode_delay < RAID_SLOWMODE]
+        monitor.saved_slowmodes = {channel.id: channel.slowmode_delay for channel in channels}
+        await set_channels_slowmode(channels, lambda channel: RAID_SLOWMODE)
         
-        await ctx.send(embed=embed)
+        while time.monotonic() < monitor.raid_until:
+            await asyncio.sleep(monitor.raid_until - time.monotonic())
+    finally:
+        saved = monitor.saved_slowmodes
+        channels = [channel for channel in guild.text_channels if channel.id in saved]
+        await set_channels_slowmode(channels, lambda channel: saved[channel.id])
+        monitor.saved_slowmodes = {}
+        await notify_raid(guild, f"✅ Raid mode ended, {monitor.actioned} suspicious accounts were {RAID_ACTION_VERBS[RAID_ACTION]}.")
+        monitor.actioned = 0
+
+async def set_channels_slowmode(channels, delay_for):
+    """Set slowmode on channels concurrently, delay_for(channel) gives each channel's delay"""
+    
+    async def edit(channel):
+        await channel.edit(slowmode_delay=delay_for(channel), reason="Raid protection")
+    
+    return await run_bulk(channels, edit, bucket=lambda channel: channel.id)
+
+def queue_raid_suspect(guild, monitor, member_id):
+    monitor.queue.append(member_id)
+    if monitor.queue_task is None or monitor.queue_task.done():
+        monitor.queue_task = asyncio.create_task(flush_raid_queue(guild, monitor))
+
+async def flush_raid_queue(guild, monitor):
+    """Action queued suspicious accounts in batches"""
+    reason = "Automatic raid protection"
+    audit_reason = f"{reason} | Suspicious account during a raid"
+    
+    while monitor.queue:
+        await asyncio.sleep(RAID_BATCH_DELAY)
+        user_ids = list(dict.fromkeys(monitor.queue))
+        monitor.queue = []
         
-    except discord.Forbidden:
-        await ctx.send("❌ I don't have permission to manage this role.")
+        try:
+            if RAID_ACTION == 'ban':
+                done, failed = await bulk_ban_users(guild, user_ids, audit_reason)
+                record_mass_action(guild.id, bot.user.id, done, 'ban', 'bans', reason)
+            else:
+                duration = f"{RAID_TIMEOUT // 60}m"
+                done, failed = await bulk_timeout_members(guild, user_ids, RAID_TIMEOUT, audit_reason)
+                record_mass_action(guild.id, bot.user.id, done, 'mute', 'mutes', reason, duration)
+            monitor.actioned += len(done)
+        except Exception as e:
+            print(f"Error actioning raid accounts: {e}")
 
-@bot.command()
-async def membercount(ctx):
-    """Show server member count"""
-    guild = ctx.guild
-    embed = discord.Embed(title=f"{guild.name} Member Count", color=0x3498db)
-    embed.add_field(name="Total Members", value=guild.member_count, inline=True)
-    embed.add_field(name="Humans", value=len([m for m in guild.members if not m.bot]), inline=True)
-    embed.add_field(name="Bots", value=len([m for m in guild.members if m.bot]), inline=True)
-    await ctx.send(embed=embed)
+def end_raid_mode(guild_id):
+    """End raid mode now, returns False if there was no raid"""
+    monitor = join_monitors.get(guild_id)
+    if monitor is None or not monitor.raid_active:
+        return False
+    monitor.raid_until = 0.0
+    monitor.raid_task.cancel()
+    return True
 
-@bot.command()
-async def serverinfo(ctx):
-    """Show server information"""
-    guild = ctx.guild
-    embed = discord.Embed(title=guild.name, color=0x3498db)
-    embed.set_thumbnail(url=guild.icon.url if guild.icon else None)
-    embed.add_field(name="Owner", value=guild.owner.mention if guild.owner else "Unknown", inline=True)
-    embed.add_field(name="Created", value=guild.created_at.strftime('%Y-%m-%d'), inline=True)
-    embed.add_field(name="Member Count", value=guild.member_count, inline=True)
-    embed.add_field(name="Text Channels", value=len(guild.text_channels), inline=True)
-    embed.add_field(name="Voice Channels", value=len(guild.voice_channels), inline=True)
-    embed.add_field(name="Roles", value=len(guild.roles), inline=True)
-    await ctx.send(embed=embed)
+def prune_join_monitors():
+    """Drop join monitors of guilds that have gone quiet"""
+    now = time.monotonic()
+    for guild_id, monitor in list(join_monitors.items()):
+        monitor.joins.expire(now)
+        if not monitor.joins and not monitor.raid_active and not monitor.queue:
+            del join_monitors[guild_id]
 
-@bot.command()
-async def roleinfo(ctx, *, role: discord.Role):
-    """Show role information"""
-    embed = discord.Embed(title=f"Role: {role.name}", color=role.color)
-    embed.add_field(name="ID", value=role.id, inline=True)
-    embed.add_field(name="Members", value=len(role.members), inline=True)
-    embed.add_field(name="Color", value=str(role.color), inline=True)
-    embed.add_field(name="Created", value=role.created_at.strftime('%Y-%m-%d'), inline=True)
-    embed.add_field(name="Mentionable", value=role.mentionable, inline=True)
-    embed.add_field(name="Hoisted", value=role.hoist, inline=True)
+# BOT COMMANDS
+
+@bot.command(hidden=True)
+@commands.is_owner()
+async def reload(ctx, extension: str = None):
+    """Reload one command extension, or all loaded ones, without restarting"""
+    if extension:
+        extensions = [extension if extension.startswith('cogs.') else f'cogs.{extension}']
+    else:
+        extensions = list(bot.extensions)
+    
+    reloaded = []
+    for name in extensions:
+        try:
+            if name in bot.extensions:
+                await bot.reload_extension(name)
+            else:
+                await bot.load_extension(name)
+            reloaded.append(name)
+        except commands.ExtensionError as e:
+            await ctx.send(f"❌ Error reloading {name}: {e}")
+    if reloaded:
+        await ctx.send(f"✅ Reloaded {', '.join(reloaded)}")
+
+@bot.command(hidden=True)
+@commands.is_owner()
+async def perf(ctx):
+    """Show command latency and bot health metrics"""
+    embed = discord.Embed(title="Performance", color=0x3498db)
+    
+    ranked = sorted(command_perf.items(), key=lambda item: item[1].latency.count, reverse=True)[:10]
+    lines = []
+    for name, stats in ranked:
+        latency = stats.latency
+        lines.append(
+            f"**{name}** ×{latency.count} | p50 {latency.percentile(0.5) * 1000:.0f}ms "
+            f"p95 {latency.percentile(0.95) * 1000:.0f}ms p99 {latency.percentile(0.99) * 1000:.0f}ms | "
+            f"API {stats.api.total / max(stats.api.count, 1) * 1000:.0f}ms avg | {stats.errors} errors"
+        )
+    embed.add_field(name="Commands", value="\n".join(lines) or "No commands run yet", inline=False)
+    
+    embed.add_field(
+        name="Event Loop Lag",
+        value=f"p50 {loop_lag.percentile(0.5) * 1000:.1f}ms, p99 {loop_lag.percentile(0.99) * 1000:.1f}ms",
+        inline=True
+    )
+    embed.add_field(
+        name="Rate Limits",
+        value=f"{perf_counters['rate_limit_waits']} waits, {perf_counters['rate_limit_seconds']:.1f}s total",
+        inline=True
+    )
+    embed.add_field(
+        name="Temp Roles",
+        value=f"p99 {temp_role_lateness.percentile(0.99):.2f}s late, {perf_counters['temp_role_overruns']} overruns",
+        inline=True
+    )
+    embed.add_field(
+        name="Command Limiter",
+        value=f"{perf_counters['limiter_allowed']} allowed, {perf_counters['limiter_user_limited']} user limited, "
+              f"{perf_counters['limiter_guild_limited']} guild limited",
+        inline=True
+    )
+    embed.add_field(
+        name="Caches",
+        value="\n".join(
+            f"{name}: {cache.hits} hits, {cache.misses} misses"
+            for name, cache in (('render', render_cache), ('mod names', mod_name_cache), ('info', info_cache))
+        ),
+        inline=True
+    )
+    embed.add_field(
+        name="Startup",
+        value=", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in startup_timings.items()) or "Not ready yet",
+        inline=True
+    )
+    embed.add_field(
+        name="State",
+        value="\n".join(f"{name}: {size}" for name, size in state_sizes().items()),
+        inline=False
+    )
     await ctx.send(embed=embed)
 
 # Slash commands removed for now - use regular ?warn command
@@ -524,8 +3087,15 @@ async def roleinfo(ctx, *, role: discord.Role):
 @bot.command()
 async def help(ctx, command_name: str = None):
     """Show help for commands"""
+    key = ('help', command_name)
+    embed = info_cache.get(key)
+    if embed is not None:
+        await ctx.send(embed=embed)
+        return
+    
     if command_name:
         # Show help for specific command
+        await load_command_extension(command_name)
         cmd = bot.get_command(command_name)
         if not cmd:
             await ctx.send(f"❌ Command '{command_name}' not found.")
@@ -533,10 +3103,34 @@ async def help(ctx, command_name: str = None):
         
         embed = discord.Embed(title=f"Help: {cmd.name}", description=cmd.help or "No description", color=0x3498db)
         embed.add_field(name="Usage", value=f"`?{cmd.name} {cmd.signature}`", inline=False)
+        info_cache.set(key, embed)
         await ctx.send(embed=embed)
         return
     
     # Show all commands
     embed = discord.Embed(title="Bot Commands", description="Use `?help <command>` for detailed info", color=0x3498db)
     
-    moderation_cmds = "kick, ban, mute, unmute, unban, warn, warnings, mods
\ No newline at end of file
+    moderation_cmds = "kick, ban, mute, unmute, unban, massban, masskick, massmute, warn, warnings, modstats, modlogs"
+    utility_cmds = "analytics, auditlog, purge, slowmode, lock, unlock, lockall, unlockall, lockdown, unlockdown, automod, escalation, raid, say, temprole, untemprole"
+    info_cmds = "membercount, serverinfo, roleinfo, help"
+    
+    embed.add_field(name="Moderation", value=moderation_cmds, inline=False)
+    embed.add_field(name="Utility", value=utility_cmds, inline=False)
+    embed.add_field(name="Info", value=info_cmds, inline=False)
+    
+    info_cache.set(key, embed)
+    await ctx.send(embed=embed)
+
+if __name__ == '__main__':
+    token = os.getenv('DISCORD_TOKEN')
+    processes = int(os.getenv('MODBOT_PROCESSES', '1'))
+    if processes > 1 and not SHARD_IDS:
+        launch_workers(token, processes, int(os.getenv('MODBOT_SHARDS', '0')))
+    else:
+        # Extensions import this module as bot, make that the running script rather than a second copy
+        sys.modules.setdefault('bot', sys.modules[__name__])
+        load_data()
+        try:
+            bot.run(token)
+        finally:
+            save_data()
@@ -0,0 +1 @@
+"""Command extensions, loaded by bot.py when one of their commands is first used"""
@@ -0,0 +1,152 @@
+"""Moderation analytics commands: leaderboards, action trends and repeat offenders"""
+import discord
+from discord.ext import commands
+import time
+from datetime import datetime, timezone
+
+from bot import ANALYTICS_DAYS, get_guild_state, mod_display_name
+
+def day_label(day):
+    return datetime.fromtimestamp(day * 86400, timezone.utc).strftime('%Y-%m-%d')
+
+def action_summary(counts):
+    """Format {action: count} as 'total (action n, ...)', most frequent first"""
+    total = sum(counts.values())
+    if not total:
+        return "0"
+    parts = ', '.join(f"{action} {count}" for action, count in sorted(counts.items(), key=lambda item: -item[1]))
+    return f"{total} ({parts})"
+
+class Analytics(commands.Cog):
+    """Moderation analytics, served from the aggregates kept in GuildAnalytics"""
+    
+    def __init__(self, bot):
+        self.bot = bot
+    
+    @commands.group(invoke_without_command=True)
+    @commands.guild_only()
+    @commands.has_permissions(kick_members=True)
+    async def analytics(self, ctx):
+        """Show a moderation overview for the last 7 days"""
+        analytics = await get_guild_state(ctx.guild.id).get_analytics()
+        today = int(time.time()) // 86400
+        
+        week = {}
+        for counts in analytics.action_counts(today - 6, today).values():
+            for action, count in counts.items():
+                week[action] = week.get(action, 0) + count
+        
+        embed = discord.Embed(title=f"Moderation Analytics for {ctx.guild.name}", color=0x3498db)
+        embed.add_field(name="Last 7 Days", value=action_summary(week), inline=False)
+        embed.add_field(
+            name="Top Moderators (7 days)",
+            value='\n'.join(
+                f"{i}. {mod_display_name(mod_id)}: {count}"
+                for i, (mod_id, count) in enumerate(analytics.top_moderators(5, today - 6), 1)
+            ) or "No actions",
+            inline=True
+        )
+        embed.add_field(
+            name="Repeat Offenders",
+            value='\n'.join(
+                f"{i}. <@{user_id}>: {count}"
+                for i, (user_id, count) in enumerate(analytics.offenders.top(5, minimum=2), 1)
+            ) or "None",
+            inline=True
+        )
+        embed.set_footer(text="?analytics mods | daily | weekly | offenders")
+        await ctx.send(embed=embed)
+    
+    @analytics.command(name='mods')
+    @commands.guild_only()
+    @commands.has_permissions(kick_members=True)
+    async def analytics_mods(self, ctx, days: int = None):
+        """Show the moderators with the most actions, all time or over the last days"""
+        if days is not None and not 1 <= days <= ANALYTICS_DAYS:
+            await ctx.send(f"❌ Days must be between 1 and {ANALYTICS_DAYS}.")
+            return
+        
+        analytics = await get_guild_state(ctx.guild.id).get_analytics()
+        since_day = int(time.time()) // 86400 - days + 1 if days else None
+        top = analytics.top_moderators(10, since_day)
+        
+        title = f"Top Moderators (last {days} days)" if days else "Top Moderators (all time)"
+        embed = discord.Embed(title=title, color=0x3498db)
+        embed.description = '\n'.join(
+            f"**{i}.** {mod_display_name(mod_id)} ({mod_id}): {count} actions"
+            for i, (mod_id, count) in enumerate(top, 1)
+        ) or "No moderation actions recorded."
+        await ctx.send(embed=embed)
+    
+    @analytics.command(name='daily')
+    @commands.guild_only()
+    @commands.has_permissions(kick_members=True)
+    async def analytics_daily(self, ctx, days: int = 14):
+        """Show action counts per day"""
+        if not 1 <= days <= 31:
+            await ctx.send("❌ Days must be between 1 and 31.")
+            return
+        
+        analytics = await get_guild_state(ctx.guild.id).get_analytics()
+        today = int(time.time()) // 86400
+        counts = analytics.action_counts(today - days + 1, today)
+        
+        embed = discord.Embed(title=f"Actions per Day (last {days} days)", color=0x3498db)
+        embed.description = '\n'.join(
+            f"`{day_label(day)}` {action_summary(counts[day])}" for day in sorted(counts, reverse=True)
+        )
+        embed.set_footer(text="Days are in UTC")
+        await ctx.send(embed=embed)
+    
+    @analytics.command(name='weekly')
+    @commands.guild_only()
+    @commands.has_permissions(kick_members=True)
+    async def analytics_weekly(self, ctx, weeks: int = 8):
+        """Show action counts per week, weeks start on Monday"""
+        max_weeks = ANALYTICS_DAYS // 7
+        if not 1 <= weeks <= max_weeks:
+            await ctx.send(f"❌ Weeks must be between 1 and {max_weeks}.")
+            return
+        
+        analytics = await get_guild_state(ctx.guild.id).get_analytics()
+        today = int(time.time()) // 86400
+        # Day 0 (1970-01-01) was a Thursday, so Mondays are the days where (day + 3) % 7 == 0
+        this_monday = today - (today + 3) % 7
+        first_day = this_monday - (weeks - 1) * 7
+        
+        per_week = {}
+        for day, counts in analytics.action_counts(first_day, today).items():
+            week = per_week.setdefault(day - (day + 3) % 7, {})
+            for action, count in counts.items():
+                week[action] = week.get(action, 0) + count
+        
+        embed = discord.Embed(title=f"Actions per Week (last {weeks} weeks)", color=0x3498db)
+        embed.description = '\n'.join(
+            f"`{day_label(monday)}` {action_summary(per_week.get(monday, {}))}"
+            for monday in range(this_monday, first_day - 1, -7)
+        )
+        embed.set_footer(text="Weeks start on Monday, UTC")
+        await ctx.send(embed=embed)
+    
+    @analytics.command(name='offenders')
+    @commands.guild_only()
+    @commands.has_permissions(kick_members=True)
+    async def analytics_offenders(self, ctx, count: int = 10):
+        """Show the users with the most warnings, mutes, kicks and bans"""
+        if not 1 <= count <= 25:
+            await ctx.send("❌ Count must be between 1 and 25.")
+            return
+        
+        analytics = await get_guild_state(ctx.guild.id).get_analytics()
+        top = analytics.offenders.top(count, minimum=2)
+        
+        embed = discord.Embed(title="Repeat Offenders", color=0xff6b6b)
+        embed.description = '\n'.join(
+            f"**{i}.** <@{user_id}> ({user_id}): {offenses} actions, "
+            f"last <t:{analytics.last_offense[user_id]}:R>"
+            for i, (user_id, offenses) in enumerate(top, 1)
+        ) or "No repeat offenders."
+        await ctx.send(embed=embed)
+
+async def setup(bot):
+    await bot.add_cog(Analytics(bot))
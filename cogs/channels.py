@@ -0,0 +1,188 @@
+"""Channel commands: slowmode, locks and purges"""
+import discord
+from discord.ext import commands
+from datetime import timedelta
+
+from bot import (
+    PURGE_LIMIT, PURGE_SCAN_LIMIT, bulk_channel_embed, check_purge_pattern, parse_time, run_purge, set_channels_locked,
+)
+
+class Channels(commands.Cog):
+    """Channel management: slowmode, locks and purges"""
+    
+    def __init__(self, bot):
+        self.bot = bot
+    
+    @commands.command()
+    @commands.has_permissions(manage_channels=True)
+    async def slowmode(self, ctx, channel: discord.TextChannel = None, delay: str = None):
+        """Set or check slowmode"""
+        if not channel:
+            channel = ctx.channel
+        
+        if not delay:
+            current = channel.slowmode_delay
+            if current == 0:
+                await ctx.send(f"{channel.mention} has no slowmode.")
+            else:
+                await ctx.send(f"{channel.mention} slowmode: {current} seconds")
+            return
+        
+        seconds = parse_time(delay)
+        if seconds is None:
+            await ctx.send("❌ Invalid time format. Use: 10s, 5m, etc.")
+            return
+        
+        if seconds > 21600:  # 6 hours max
+            await ctx.send("❌ Maximum slowmode is 6 hours.")
+            return
+        
+        try:
+            await channel.edit(slowmode_delay=seconds)
+            if seconds == 0:
+                await ctx.send(f"✅ Slowmode disabled for {channel.mention}")
+            else:
+                await ctx.send(f"✅ Slowmode set to {delay} for {channel.mention}")
+        except discord.Forbidden:
+            await ctx.send("❌ I don't have permission to edit this channel.")
+    
+    @commands.command()
+    @commands.has_permissions(manage_channels=True)
+    async def lock(self, ctx, channel: discord.TextChannel = None):
+        """Lock a channel"""
+        if not channel:
+            channel = ctx.channel
+        
+        try:
+            await channel.set_permissions(ctx.guild.default_role, send_messages=False)
+            embed = discord.Embed(title="Channel Locked", description=f"{channel.mention} has been locked.", color=0xff0000)
+            await ctx.send(embed=embed)
+        except discord.Forbidden:
+            await ctx.send("❌ I don't have permission to edit this channel.")
+    
+    @commands.command()
+    @commands.has_permissions(manage_channels=True)
+    async def unlock(self, ctx, channel: discord.TextChannel = None):
+        """Unlock a channel"""
+        if not channel:
+            channel = ctx.channel
+        
+        try:
+            await channel.set_permissions(ctx.guild.default_role, send_messages=None)
+            embed = discord.Embed(title="Channel Unlocked", description=f"{channel.mention} has been unlocked.", color=0x00ff00)
+            await ctx.send(embed=embed)
+        except discord.Forbidden:
+            await ctx.send("❌ I don't have permission to edit this channel.")
+    
+    @commands.command()
+    @commands.has_permissions(manage_channels=True)
+    async def lockall(self, ctx):
+        """Lock all channels in current category"""
+        category = ctx.channel.category
+        if not category:
+            await ctx.send("❌ This channel is not in a category.")
+            return
+        
+        channels = [channel for channel in category.channels if isinstance(channel, discord.TextChannel)]
+        results, elapsed = await set_channels_locked(ctx.guild, channels, True)
+        
+        embed = bulk_channel_embed("Category Locked", "Locked", category.name, results, elapsed, 0xff0000)
+        await ctx.send(embed=embed)
+    
+    @commands.command()
+    @commands.has_permissions(manage_channels=True)
+    async def unlockall(self, ctx):
+        """Unlock all channels in current category"""
+        category = ctx.channel.category
+        if not category:
+            await ctx.send("❌ This channel is not in a category.")
+            return
+        
+        channels = [channel for channel in category.channels if isinstance(channel, discord.TextChannel)]
+        results, elapsed = await set_channels_locked(ctx.guild, channels, False)
+        
+        embed = bulk_channel_embed("Category Unlocked", "Unlocked", category.name, results, elapsed, 0x00ff00)
+        await ctx.send(embed=embed)
+    
+    @commands.command()
+    @commands.has_permissions(manage_channels=True)
+    async def lockdown(self, ctx):
+        """Lock every text channel in the server"""
+        results, elapsed = await set_channels_locked(ctx.guild, ctx.guild.text_channels, True)
+        
+        embed = bulk_channel_embed("Server Locked Down", "Locked", ctx.guild.name, results, elapsed, 0xff0000)
+        await ctx.send(embed=embed)
+    
+    @commands.command()
+    @commands.has_permissions(manage_channels=True)
+    async def unlockdown(self, ctx):
+        """Unlock every text channel in the server"""
+        results, elapsed = await set_channels_locked(ctx.guild, ctx.guild.text_channels, False)
+        
+        embed = bulk_channel_embed("Server Lockdown Lifted", "Unlocked", ctx.guild.name, results, elapsed, 0x00ff00)
+        await ctx.send(embed=embed)
+    
+    @commands.group(invoke_without_command=True)
+    @commands.has_permissions(manage_messages=True)
+    @commands.bot_has_permissions(manage_messages=True, read_message_history=True)
+    async def purge(self, ctx, count: int):
+        """Delete the last count messages in this channel"""
+        if not 1 <= count <= PURGE_LIMIT:
+            await ctx.send(f"❌ Count must be between 1 and {PURGE_LIMIT}.")
+            return
+        await run_purge(ctx, lambda message: True, count, count, "messages")
+    
+    @purge.command(name='user')
+    @commands.has_permissions(manage_messages=True)
+    @commands.bot_has_permissions(manage_messages=True, read_message_history=True)
+    async def purge_user(self, ctx, user: discord.User, count: int = 100):
+        """Delete a user's last count messages in this channel"""
+        if not 1 <= count <= PURGE_LIMIT:
+            await ctx.send(f"❌ Count must be between 1 and {PURGE_LIMIT}.")
+            return
+        await run_purge(ctx, lambda message: message.author.id == user.id, count, PURGE_SCAN_LIMIT, f"messages from {user}")
+    
+    @purge.command(name='match')
+    @commands.has_permissions(manage_messages=True)
+    @commands.bot_has_permissions(manage_messages=True, read_message_history=True)
+    async def purge_match(self, ctx, *, pattern: str):
+        """Delete recent messages matching a regex"""
+        regex, error = check_purge_pattern(pattern)
+        if error:
+            await ctx.send(f"❌ {error}")
+            return
+        await run_purge(ctx, lambda message: regex.search(message.content), PURGE_LIMIT, PURGE_SCAN_LIMIT, "matching messages")
+    
+    @purge.command(name='since')
+    @commands.has_permissions(manage_messages=True)
+    @commands.bot_has_permissions(manage_messages=True, read_message_history=True)
+    async def purge_since(self, ctx, duration: str):
+        """Delete every message sent in the last duration, e.g. 30m"""
+        seconds = parse_time(duration)
+        if not seconds:
+            await ctx.send("❌ Invalid time format. Use: 10s, 5m, 2h, 1d")
+            return
+        after = discord.utils.utcnow() - timedelta(seconds=seconds)
+        await run_purge(ctx, lambda message: True, PURGE_LIMIT, PURGE_SCAN_LIMIT, f"messages from the last {duration}", after=after)
+    
+    @purge.command(name='range')
+    @commands.has_permissions(manage_messages=True)
+    @commands.bot_has_permissions(manage_messages=True, read_message_history=True)
+    async def purge_range(self, ctx, start: str, end: str):
+        """Delete messages sent between start and end ago, e.g. `2h 1h`"""
+        start_seconds = parse_time(start)
+        end_seconds = parse_time(end)
+        if not start_seconds or not end_seconds:
+            await ctx.send("❌ Invalid time format. Use: 10s, 5m, 2h, 1d")
+            return
+        if end_seconds >= start_seconds:
+            await ctx.send("❌ The start must be further back than the end, e.g. `?purge range 2h 1h`.")
+            return
+        now = discord.utils.utcnow()
+        await run_purge(
+            ctx, lambda message: True, PURGE_LIMIT, PURGE_SCAN_LIMIT, f"messages from {start} to {end} ago",
+            before=now - timedelta(seconds=end_seconds), after=now - timedelta(seconds=start_seconds)
+        )
+
+async def setup(bot):
+    await bot.add_cog(Channels(bot))
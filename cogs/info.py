@@ -0,0 +1,83 @@
+"""Server and role information commands"""
+import discord
+from discord.ext import commands
+
+from bot import get_member_counts, info_cache, needs_members
+
+class Info(commands.Cog):
+    """Server and role information"""
+    
+    def __init__(self, bot):
+        self.bot = bot
+    
+    @commands.command()
+    @commands.guild_only()
+    @needs_members()
+    async def membercount(self, ctx):
+        """Show server member count"""
+        guild = ctx.guild
+        key = ('membercount', guild.id)
+        embed = info_cache.get(key)
+        if embed is not None:
+            await ctx.send(embed=embed)
+            return
+        
+        counts = get_member_counts(guild)
+        embed = discord.Embed(title=f"{guild.name} Member Count", color=0x3498db)
+        embed.add_field(name="Total Members", value=guild.member_count, inline=True)
+        embed.add_field(name="Humans", value=counts.humans, inline=True)
+        embed.add_field(name="Bots", value=counts.bots, inline=True)
+        info_cache.set(key, embed)
+        await ctx.send(embed=embed)
+    
+    @commands.command()
+    @commands.guild_only()
+    async def serverinfo(self, ctx):
+        """Show server information"""
+        guild = ctx.guild
+        key = ('serverinfo', guild.id)
+        embed = info_cache.get(key)
+        if embed is not None:
+            await ctx.send(embed=embed)
+            return
+        
+        embed = discord.Embed(title=guild.name, color=0x3498db)
+        embed.set_thumbnail(url=guild.icon.url if guild.icon else None)
+        embed.add_field(name="Owner", value=guild.owner.mention if guild.owner else "Unknown", inline=True)
+        embed.add_field(name="Created", value=guild.created_at.strftime('%Y-%m-%d'), inline=True)
+        embed.add_field(name="Member Count", value=guild.member_count, inline=True)
+        embed.add_field(name="Text Channels", value=len(guild.text_channels), inline=True)
+        embed.add_field(name="Voice Channels", value=len(guild.voice_channels), inline=True)
+        embed.add_field(name="Roles", value=len(guild.roles), inline=True)
+        info_cache.set(key, embed)
+        await ctx.send(embed=embed)
+    
+    @commands.command()
+    @commands.guild_only()
+    @needs_members()
+    async def roleinfo(self, ctx, *, role: discord.Role):
+        """Show role information"""
+        key = ('roleinfo', role.id)
+        embed = info_cache.get(key)
+        if embed is not None:
+            await ctx.send(embed=embed)
+            return
+        
+        counts = get_member_counts(ctx.guild)
+        if role.is_default():
+            member_total = counts.humans + counts.bots
+        else:
+            member_total = counts.roles.get(role.id, 0)
+        
+        embed = discord.Embed(title=f"Role: {role.name}", color=role.color)
+        embed.add_field(name="ID", value=role.id, inline=True)
+        embed.add_field(name="Members", value=member_total, inline=True)
+        embed.add_field(name="Color", value=str(role.color), inline=True)
+        embed.add_field(name="Created", value=role.created_at.strftime('%Y-%m-%d'), inline=True)
+        embed.add_field(name="Mentionable", value=role.mentionable, inline=True)
+        embed.add_field(name="Hoisted", value=role.hoist, inline=True)
+        info_cache.set(key, embed)
+        await ctx.send(embed=embed)
+
+async def setup(bot):
+    await bot.add_cog(Info(bot))
@@ -0,0 +1,488 @@
+"""Moderation commands: kicks, bans, mutes, warnings and their history"""
+import discord
+from discord.ext import commands
+import math
+import time
+from datetime import datetime
+from typing import Optional
+
+from bot import (
+    ESCALATION_ACTIONS, HISTORY_PAGE_SIZE, NO_REASON, EscalationRule, apply_escalation, audit_queues, backend,
+    ban_member, bulk_ban_users, bulk_timeout_members, check_mass_targets, get_guild_state, history_page_count,
+    kick_member, mass_action_embed, mod_display_name, parse_mass_targets, parse_time,
+    record_mass_action, record_warning, render_cache, run_bulk, send_paginated, split_bulk_results,
+    timeout_member,
+)
+
+class Moderation(commands.Cog):
+    """Member moderation: kicks, bans, mutes, warnings and their history"""
+    
+    def __init__(self, bot):
+        self.bot = bot
+    
+    @commands.command()
+    @commands.has_permissions(kick_members=True)
+    async def kick(self, ctx, member: discord.Member, *, reason=NO_REASON):
+        """Kick a member"""
+        try:
+            await kick_member(member, ctx.author, reason)
+            
+            embed = discord.Embed(title="Member Kicked", color=0xff9900)
+            embed.add_field(name="User", value=f"{member} ({member.id})", inline=False)
+            embed.add_field(name="Moderator", value=ctx.author.mention, inline=True)
+            embed.add_field(name="Reason", value=reason, inline=True)
+            
+            await ctx.send(embed=embed)
+            
+        except discord.Forbidden:
+            await ctx.send("❌ I don't have permission to kick this user.")
+        except Exception as e:
+            await ctx.send(f"❌ Error: {e}")
+    
+    @commands.command()
+    @commands.has_permissions(ban_members=True)
+    async def ban(self, ctx, member: discord.Member, *, reason=NO_REASON):
+        """Ban a member"""
+        try:
+            await ban_member(member, ctx.author, reason)
+            
+            embed = discord.Embed(title="Member Banned", color=0xff0000)
+            embed.add_field(name="User", value=f"{member} ({member.id})", inline=False)
+            embed.add_field(name="Moderator", value=ctx.author.mention, inline=True)
+            embed.add_field(name="Reason", value=reason, inline=True)
+            
+            await ctx.send(embed=embed)
+            
+        except discord.Forbidden:
+            await ctx.send("❌ I don't have permission to ban this user.")
+        except Exception as e:
+            await ctx.send(f"❌ Error: {e}")
+    
+    @commands.command()
+    @commands.has_permissions(moderate_members=True)
+    async def mute(self, ctx, member: discord.Member, duration: str = None, *, reason=NO_REASON):
+        """Mute a member using Discord timeout"""
+        if not duration:
+            await ctx.send("❌ Please specify duration (e.g., 10m, 1h, 1d)")
+            return
+        
+        seconds = parse_time(duration)
+        if not seconds:
+            await ctx.send("❌ Invalid time format. Use: 10s, 5m, 2h, 1d")
+            return
+        
+        if seconds > 2419200:  # 28 days max
+            await ctx.send("❌ Maximum timeout duration is 28 days.")
+            return
+        
+        try:
+            await timeout_member(member, seconds, ctx.author, reason, duration)
+            
+            embed = discord.Embed(title="Member Muted", color=0xffff00)
+            embed.add_field(name="User", value=f"{member} ({member.id})", inline=False)
+            embed.add_field(name="Duration", value=duration, inline=True)
+            embed.add_field(name="Moderator", value=ctx.author.mention, inline=True)
+            embed.add_field(name="Reason", value=reason, inline=False)
+            
+            await ctx.send(embed=embed)
+            
+        except discord.Forbidden:
+            await ctx.send("❌ I don't have permission to timeout this user.")
+        except Exception as e:
+            await ctx.send(f"❌ Error: {e}")
+    
+    @commands.command()
+    @commands.has_permissions(moderate_members=True)
+    async def unmute(self, ctx, member: discord.Member, *, reason=NO_REASON):
+        """Unmute a member"""
+        try:
+            await member.timeout(None, reason=f"Unmuted by {ctx.author} | {reason}")
+            
+            embed = discord.Embed(title="Member Unmuted", color=0x00ff00)
+            embed.add_field(name="User", value=f"{member} ({member.id})", inline=False)
+            embed.add_field(name="Moderator", value=ctx.author.mention, inline=True)
+            embed.add_field(name="Reason", value=reason, inline=True)
+            
+            await ctx.send(embed=embed)
+            state = get_guild_state(ctx.guild.id)
+            state.add_mod_action(ctx.author.id, 'unmutes')
+            state.add_mod_log(member.id, 'unmute', ctx.author.id, reason)
+            
+        except discord.Forbidden:
+            await ctx.send("❌ I don't have permission to remove timeout from this user.")
+        except Exception as e:
+            await ctx.send(f"❌ Error: {e}")
+    
+    @commands.command()
+    @commands.has_permissions(ban_members=True)
+    async def unban(self, ctx, user_id: int, *, reason=NO_REASON):
+        """Unban a user by ID"""
+        try:
+            user = await self.bot.fetch_user(user_id)
+            await ctx.guild.unban(user, reason=f"Unbanned by {ctx.author} | {reason}")
+            
+            embed = discord.Embed(title="User Unbanned", color=0x00ff00)
+            embed.add_field(name="User", value=f"{user} ({user.id})", inline=False)
+            embed.add_field(name="Moderator", value=ctx.author.mention, inline=True)
+            embed.add_field(name="Reason", value=reason, inline=True)
+            
+            await ctx.send(embed=embed)
+            state = get_guild_state(ctx.guild.id)
+            state.add_mod_action(ctx.author.id, 'unbans')
+            state.add_mod_log(user.id, 'unban', ctx.author.id, reason)
+            
+        except discord.NotFound:
+            await ctx.send("❌ User not found or not banned.")
+        except discord.Forbidden:
+            await ctx.send("❌ I don't have permission to unban users.")
+        except Exception as e:
+            await ctx.send(f"❌ Error: {e}")
+    
+    @commands.command()
+    @commands.is_owner()
+    async def globalunban(self, ctx, user_id: int, *, reason=NO_REASON):
+        """Unban a user from every server the bot is in, across all shards"""
+        status = await ctx.send(f"⏳ Unbanning {user_id} everywhere...")
+        payload = {
+            'user_id': user_id,
+            'mod_id': ctx.author.id,
+            'reason': reason,
+            'audit_reason': f"Global unban by {ctx.author} | {reason}"[:512],
+        }
+        results = await backend.broadcast('unban', payload)
+        
+        errors = [result['error'] for result in results if 'error' in result]
+        totals = {key: sum(result.get(key, 0) for result in results) for key in ('unbanned', 'not_banned', 'failed')}
+        
+        embed = discord.Embed(title="Global Unban", color=0x00ff00 if len(results) == backend.workers and not errors else 0xff9900)
+        embed.add_field(name="User", value=str(user_id), inline=False)
+        embed.add_field(name="Unbanned In", value=f"{totals['unbanned']} servers", inline=True)
+        embed.add_field(name="Not Banned In", value=f"{totals['not_banned']} servers", inline=True)
+        if totals['failed']:
+            embed.add_field(name="Failed In", value=f"{totals['failed']} servers", inline=True)
+        embed.add_field(name="Workers Answered", value=f"{len(results)}/{backend.workers}", inline=True)
+        if errors:
+            embed.add_field(name="Errors", value='\n'.join(errors[:5]), inline=False)
+        embed.add_field(name="Reason", value=reason, inline=False)
+        await status.edit(content=None, embed=embed)
+    
+    @commands.command()
+    @commands.has_permissions(ban_members=True)
+    async def massban(self, ctx, *, targets: str = ""):
+        """Ban many users by ID or mention, or from an attached file of IDs"""
+        user_ids, reason = await parse_mass_targets(ctx, targets)
+        if not await check_mass_targets(ctx, user_ids):
+            return
+        
+        audit_reason = f"Mass banned by {ctx.author} | {reason}"[:512]
+        started = time.perf_counter()
+        done, failed = await bulk_ban_users(ctx.guild, user_ids, audit_reason)
+        elapsed = time.perf_counter() - started
+        
+        record_mass_action(ctx.guild.id, ctx.author.id, done, 'ban', 'bans', reason)
+        await ctx.send(embed=mass_action_embed("Mass Ban", "Banned", ctx, done, failed, reason, elapsed, 0xff0000))
+    
+    @commands.command()
+    @commands.has_permissions(kick_members=True)
+    async def masskick(self, ctx, *, targets: str = ""):
+        """Kick many users by ID or mention, or from an attached file of IDs"""
+        user_ids, reason = await parse_mass_targets(ctx, targets)
+        if not await check_mass_targets(ctx, user_ids):
+            return
+        
+        audit_reason = f"Mass kicked by {ctx.author} | {reason}"[:512]
+        
+        async def kick_one(user_id):
+            await ctx.guild.kick(discord.Object(id=user_id), reason=audit_reason)
+        
+        results, elapsed = await run_bulk(user_ids, kick_one)
+        done, failed = split_bulk_results(results)
+        
+        record_mass_action(ctx.guild.id, ctx.author.id, done, 'kick', 'kicks', reason)
+        await ctx.send(embed=mass_action_embed("Mass Kick", "Kicked", ctx, done, failed, reason, elapsed, 0xff9900))
+    
+    @commands.command()
+    @commands.has_permissions(moderate_members=True)
+    async def massmute(self, ctx, duration: str, *, targets: str = ""):
+        """Timeout many users by ID or mention, or from an attached file of IDs"""
+        seconds = parse_time(duration)
+        if not seconds:
+            await ctx.send("❌ Invalid time format. Use: 10s, 5m, 2h, 1d")
+            return
+        
+        if seconds > 2419200:  # 28 days max
+            await ctx.send("❌ Maximum timeout duration is 28 days.")
+            return
+        
+        user_ids, reason = await parse_mass_targets(ctx, targets)
+        if not await check_mass_targets(ctx, user_ids):
+            return
+        
+        audit_reason = f"Mass muted by {ctx.author} | {reason}"[:512]
+        started = time.perf_counter()
+        done, failed = await bulk_timeout_members(ctx.guild, user_ids, seconds, audit_reason)
+        elapsed = time.perf_counter() - started
+        
+        record_mass_action(ctx.guild.id, ctx.author.id, done, 'mute', 'mutes', reason, duration)
+        await ctx.send(embed=mass_action_embed("Mass Mute", "Muted", ctx, done, failed, reason, elapsed, 0xffff00))
+    
+    @commands.command()
+    @commands.has_permissions(kick_members=True)
+    async def warn(self, ctx, member: discord.Member, *, reason=NO_REASON):
+        """Warn a member"""
+        warning_count, rule = record_warning(ctx.guild.id, member.id, ctx.author.id, reason)
+        
+        embed = discord.Embed(title="Member Warned", color=0xffa500)
+        embed.add_field(name="User", value=f"{member} ({member.id})", inline=False)
+        embed.add_field(name="Warning Count", value=warning_count, inline=True)
+        embed.add_field(name="Moderator", value=ctx.author.mention, inline=True)
+        embed.add_field(name="Reason", value=reason, inline=False)
+        
+        if rule:
+            try:
+                done = await apply_escalation(member, rule)
+                embed.add_field(name="Escalation", value=f"{member.mention} was {done} ({rule.trigger})", inline=False)
+            except discord.Forbidden:
+                embed.add_field(name="Escalation", value=f"❌ I don't have permission to {rule.action} this user.", inline=False)
+            except discord.HTTPException as e:
+                embed.add_field(name="Escalation", value=f"❌ Error: {e}", inline=False)
+        
+        await ctx.send(embed=embed)
+    
+    @commands.command(name='warnings')
+    @commands.guild_only()
+    async def warnings_cmd(self, ctx, member: Optional[discord.Member] = None, page: int = 1):
+        """Check warnings for a user"""
+        if not member:
+            member = ctx.author
+        
+        state = get_guild_state(ctx.guild.id)
+        total, last_id = await state.count_warnings(member.id)
+        if not total:
+            await ctx.send(f"{member} has no warnings.")
+            return
+        
+        # Warnings are append-only, so pages up to last_id stay stable while the view is open
+        page_count = history_page_count(total)
+        
+        async def render(page):
+            key = (ctx.guild.id, member.id, 'warnings', last_id, page)
+            embed = render_cache.get(key)
+            if embed is None:
+                embed = discord.Embed(title=f"Warnings for {member}", color=0xff6b6b)
+                embed.set_thumbnail(url=member.display_avatar.url)
+                
+                warnings = state.warning_page(member.id, last_id, page)
+                first = total - page * HISTORY_PAGE_SIZE - len(warnings)
+                now = time.time()
+                for i, warning in enumerate(warnings, first):
+                    date = datetime.fromisoformat(warning['timestamp']).strftime('%Y-%m-%d %H:%M')
+                    expired = " (expired)" if state.is_warning_expired(warning, now) else ""
+                    
+                    embed.add_field(
+                        name=f"Warning {i + 1}{expired}",
+                        value=f"**Reason:** {warning['reason']}\n**Moderator:** {mod_display_name(warning['mod_id'])}\n**Date:** {date}",
+                        inline=False
+                    )
+                embed.set_footer(text=f"Page {page + 1}/{page_count} • {total} warnings")
+                render_cache.set(key, embed)
+            return embed
+        
+        await send_paginated(ctx, render, page_count, page - 1)
+    
+    @commands.command()
+    @commands.guild_only()
+    async def modstats(self, ctx, member: discord.Member = None):
+        """Check moderation statistics"""
+        if not member:
+            member = ctx.author
+        
+        stats = get_guild_state(ctx.guild.id).mod_stats.get(member.id)
+        if not stats:
+            await ctx.send(f"{member} has no moderation actions recorded.")
+            return
+        
+        total = sum(stats.values())
+        
+        embed = discord.Embed(title=f"Moderation Stats for {member}", color=0x3498db)
+        embed.set_thumbnail(url=member.display_avatar.url)
+        embed.add_field(name="Kicks", value=stats.get('kicks', 0), inline=True)
+        embed.add_field(name="Bans", value=stats.get('bans', 0), inline=True)
+        embed.add_field(name="Mutes", value=stats.get('mutes', 0), inline=True)
+        embed.add_field(name="Warnings", value=stats.get('warns', 0), inline=True)
+        embed.add_field(name="Unmutes", value=stats.get('unmutes', 0), inline=True)
+        embed.add_field(name="Unbans", value=stats.get('unbans', 0), inline=True)
+        if stats.get('other'):
+            embed.add_field(name="Other", value=stats['other'], inline=True)
+        embed.add_field(name="Total Actions", value=total, inline=True)
+        
+        await ctx.send(embed=embed)
+    
+    @commands.command()
+    @commands.guild_only()
+    @commands.has_permissions(manage_guild=True)
+    async def auditlog(self, ctx, channel: Optional[discord.TextChannel] = None, setting: str = None):
+        """Set the channel that receives every moderation action, or `?auditlog off`"""
+        state = get_guild_state(ctx.guild.id)
+        
+        if channel:
+            state.audit_channel_id = channel.id
+            state.save_audit_channel()
+            await ctx.send(f"✅ Moderation actions will be posted to {channel.mention}.")
+            return
+        if setting:
+            if setting.lower() != 'off':
+                await ctx.send("❌ Use `?auditlog #channel` or `?auditlog off`.")
+                return
+            state.audit_channel_id = None
+            state.save_audit_channel()
+            await ctx.send("✅ Audit log turned off.")
+            return
+        
+        embed = discord.Embed(title="Audit Log", color=0x3498db)
+        embed.add_field(
+            name="Channel",
+            value=f"<#{state.audit_channel_id}>" if state.audit_channel_id else "Off",
+            inline=True
+        )
+        audit = audit_queues.get(ctx.guild.id)
+        embed.add_field(name="Queued", value=audit.queue.qsize() if audit else 0, inline=True)
+        if audit and audit.dropped:
+            embed.add_field(name="Dropped", value=audit.dropped, inline=True)
+        await ctx.send(embed=embed)
+    
+    @commands.command()
+    @commands.guild_only()
+    async def modlogs(self, ctx, member: Optional[discord.Member] = None, page: Optional[int] = 1, period: str = None):
+        """Check moderation logs for a user, optionally only the last period (e.g. 7d)"""
+        if not member:
+            member = ctx.author
+        
+        seconds = None
+        if period:
+            seconds = parse_time(period)
+            if not seconds:
+                await ctx.send("❌ Invalid time format. Use: 12h, 7d, etc.")
+                return
+        
+        state = get_guild_state(ctx.guild.id)
+        total, last_id, since = await state.count_mod_logs(member.id, seconds)
+        if not total:
+            if period:
+                await ctx.send(f"{member} has no moderation history in the last {period}.")
+            else:
+                await ctx.send(f"{member} has no moderation history.")
+            return
+        
+        # Mod logs are append-only, so pages up to last_id stay stable while the view is open
+        page_count = history_page_count(total)
+        
+        async def render(page):
+            key = (ctx.guild.id, member.id, 'modlogs', last_id, total, period, page)
+            embed = render_cache.get(key)
+            if embed is None:
+                title = f"Moderation Logs for {member}"
+                if period:
+                    title += f" (last {period})"
+                
+                embed = discord.Embed(title=title, color=0xe74c3c)
+                embed.set_thumbnail(url=member.display_avatar.url)
+                
+                for log in state.mod_log_page(member.id, last_id, page, since):
+                    date = datetime.fromtimestamp(log.timestamp).strftime('%Y-%m-%d %H:%M')
+                    
+                    field_value = f"**Moderator:** {mod_display_name(log.mod_id)}\n**Reason:** {log.reason}\n**Date:** {date}"
+                    if log.duration:
+                        field_value += f"\n**Duration:** {log.duration}"
+                    
+                    embed.add_field(
+                        name=f"{log.action.title()}",
+                        value=field_value,
+                        inline=False
+                    )
+                embed.set_footer(text=f"Page {page + 1}/{page_count} • {total} entries")
+                render_cache.set(key, embed)
+            return embed
+        
+        await send_paginated(ctx, render, page_count, page - 1)
+    
+    @commands.group(invoke_without_command=True)
+    @commands.has_permissions(manage_guild=True)
+    async def escalation(self, ctx):
+        """Show the warning escalation policy"""
+        policy = get_guild_state(ctx.guild.id).escalation
+        
+        embed = discord.Embed(title="Warning Escalation", color=0x3498db)
+        embed.add_field(name="Warnings Expire", value=f"After {policy.expiry}" if policy.expiry else "Never", inline=False)
+        rules = sorted(policy.rules, key=lambda rule: (rule.warns, parse_time(rule.window) if rule.window else math.inf))
+        embed.add_field(
+            name="Rules",
+            value='\n'.join(rule.describe() for rule in rules) or "None, add one with `?escalation add 3 24h mute 1h`",
+            inline=False
+        )
+        await ctx.send(embed=embed)
+    
+    @escalation.command(name='add')
+    @commands.has_permissions(manage_guild=True)
+    async def escalation_add(self, ctx, warns: int, window: str, action: str, duration: str = None):
+        """Add a rule, e.g. `3 24h mute 1h` or `5 all kick`"""
+        action = action.lower()
+        window = None if window.lower() == 'all' else window.lower()
+        
+        if warns < 1:
+            await ctx.send("❌ Warning count must be at least 1.")
+            return
+        if window and not parse_time(window):
+            await ctx.send("❌ Invalid window. Use a time like 24h or `all` for every active warning.")
+            return
+        if action not in ESCALATION_ACTIONS:
+            await ctx.send(f"❌ Action must be one of: {', '.join(ESCALATION_ACTIONS)}")
+            return
+        if action == 'mute':
+            seconds = parse_time(duration)
+            if not seconds or seconds > 2419200:
+                await ctx.send("❌ Mutes need a duration up to 28 days (e.g., 10m, 1h, 1d).")
+                return
+        else:
+            duration = None
+        
+        state = get_guild_state(ctx.guild.id)
+        policy = state.escalation
+        policy.rules = [rule for rule in policy.rules if (rule.warns, rule.window) != (warns, window)]
+        rule = EscalationRule(warns, window, action, duration)
+        policy.rules.append(rule)
+        state.save_escalation()
+        await ctx.send(f"✅ Added escalation rule: {rule.describe()}")
+    
+    @escalation.command(name='remove')
+    @commands.has_permissions(manage_guild=True)
+    async def escalation_remove(self, ctx, warns: int, window: str = 'all'):
+        """Remove the rule for a warning count and window"""
+        window = None if window.lower() == 'all' else window.lower()
+        state = get_guild_state(ctx.guild.id)
+        policy = state.escalation
+        
+        rules = [rule for rule in policy.rules if (rule.warns, rule.window) != (warns, window)]
+        if len(rules) == len(policy.rules):
+            await ctx.send("❌ No rule found for that warning count and window.")
+            return
+        policy.rules = rules
+        state.save_escalation()
+        await ctx.send("✅ Escalation rule removed.")
+    
+    @escalation.command(name='expiry')
+    @commands.has_permissions(manage_guild=True)
+    async def escalation_expiry(self, ctx, duration: str):
+        """Set how long warnings count for, or `never`"""
+        duration = duration.lower()
+        if duration != 'never' and not parse_time(duration):
+            await ctx.send("❌ Invalid time format. Use: 7d, 30d or never")
+            return
+        
+        state = get_guild_state(ctx.guild.id)
+        state.escalation.expiry = None if duration == 'never' else duration
+        state.save_escalation()
+        await ctx.send(f"✅ Warnings now {'never expire' if duration == 'never' else f'expire after {duration}'}.")
+
+async def setup(bot):
+    await bot.add_cog(Moderation(bot))
@@ -0,0 +1,126 @@
+"""Automod and raid protection settings"""
+import discord
+from discord.ext import commands
+import time
+
+from bot import (
+    AUTOMOD_DUPLICATE_LIMIT, AUTOMOD_SPAM_LIMIT, AUTOMOD_WINDOW, JoinMonitor, RAID_JOIN_LIMIT,
+    RAID_NAME_CLUSTER, RAID_NEW_ACCOUNT_SHARE, RAID_WINDOW, end_raid_mode, get_guild_state,
+    join_monitors, start_raid_mode,
+)
+
+class Protection(commands.Cog):
+    """Automod and raid protection settings"""
+    
+    def __init__(self, bot):
+        self.bot = bot
+    
+    @commands.group(invoke_without_command=True)
+    @commands.has_permissions(manage_guild=True)
+    async def automod(self, ctx, setting: str = None):
+        """Show automod settings, or turn it on/off"""
+        state = get_guild_state(ctx.guild.id)
+        config = state.automod
+        
+        if setting:
+            if setting.lower() not in ('on', 'off'):
+                await ctx.send("❌ Use `?automod on` or `?automod off`.")
+                return
+            config.enabled = setting.lower() == 'on'
+            state.save_automod()
+            await ctx.send(f"✅ Automod is now {'on' if config.enabled else 'off'}.")
+            return
+        
+        embed = discord.Embed(title="Automod Settings", color=0x3498db)
+        embed.add_field(name="Enabled", value=config.enabled, inline=True)
+        embed.add_field(name="Block Links", value=config.block_links, inline=True)
+        embed.add_field(name="Banned Words", value=len(config.banned_words), inline=True)
+        embed.add_field(
+            name="Limits",
+            value=f"Mute after {AUTOMOD_SPAM_LIMIT} messages or warn after {AUTOMOD_DUPLICATE_LIMIT} repeats in {AUTOMOD_WINDOW}s",
+            inline=False
+        )
+        await ctx.send(embed=embed)
+    
+    @automod.command(name='links')
+    @commands.has_permissions(manage_guild=True)
+    async def automod_links(self, ctx, setting: str):
+        """Turn link blocking on/off"""
+        if setting.lower() not in ('on', 'off'):
+            await ctx.send("❌ Use `?automod links on` or `?automod links off`.")
+            return
+        state = get_guild_state(ctx.guild.id)
+        state.automod.block_links = setting.lower() == 'on'
+        state.save_automod()
+        await ctx.send(f"✅ Link blocking is now {setting.lower()}.")
+    
+    @automod.command(name='addword')
+    @commands.has_permissions(manage_guild=True)
+    async def automod_addword(self, ctx, *words: str):
+        """Add banned words"""
+        if not words:
+            await ctx.send("❌ Please specify at least one word.")
+            return
+        state = get_guild_state(ctx.guild.id)
+        state.automod.banned_words.update(word.lower() for word in words)
+        state.save_automod()
+        await ctx.message.delete()
+        await ctx.send(f"✅ Added {len(words)} banned word(s).")
+    
+    @automod.command(name='removeword')
+    @commands.has_permissions(manage_guild=True)
+    async def automod_removeword(self, ctx, *words: str):
+        """Remove banned words"""
+        state = get_guild_state(ctx.guild.id)
+        removed = [word for word in (word.lower() for word in words) if word in state.automod.banned_words]
+        state.automod.banned_words.difference_update(removed)
+        state.save_automod()
+        await ctx.send(f"✅ Removed {len(removed)} banned word(s).")
+    
+    @commands.group(invoke_without_command=True)
+    @commands.has_permissions(manage_guild=True)
+    async def raid(self, ctx):
+        """Show raid protection status"""
+        monitor = join_monitors.get(ctx.guild.id)
+        active = bool(monitor and monitor.raid_active)
+        
+        embed = discord.Embed(title="Raid Protection", color=0xff0000 if active else 0x00ff00)
+        embed.add_field(name="Raid Mode", value="Active" if active else "Off", inline=True)
+        if monitor:
+            monitor.joins.expire(time.monotonic())
+            embed.add_field(name=f"Joins (last {RAID_WINDOW}s)", value=len(monitor.joins), inline=True)
+            embed.add_field(name="Queued", value=len(monitor.queue), inline=True)
+            if active:
+                embed.add_field(name="Actioned", value=monitor.actioned, inline=True)
+        embed.add_field(
+            name="Triggers",
+            value=f"{RAID_JOIN_LIMIT}+ joins in {RAID_WINDOW}s with {RAID_NEW_ACCOUNT_SHARE:.0%} new accounts, "
+                  f"or {RAID_NAME_CLUSTER}+ similar names",
+            inline=False
+        )
+        await ctx.send(embed=embed)
+    
+    @raid.command(name='start')
+    @commands.has_permissions(manage_guild=True)
+    async def raid_start(self, ctx):
+        """Turn raid mode on manually"""
+        monitor = join_monitors.get(ctx.guild.id)
+        if monitor is None:
+            monitor = join_monitors[ctx.guild.id] = JoinMonitor()
+        if monitor.raid_active:
+            await ctx.send("❌ Raid mode is already on.")
+            return
+        start_raid_mode(ctx.guild, monitor, f"Started by {ctx.author}")
+        await ctx.send("🚨 Raid mode is on.")
+    
+    @raid.command(name='end')
+    @commands.has_permissions(manage_guild=True)
+    async def raid_end(self, ctx):
+        """End raid mode and restore slowmode"""
+        if not end_raid_mode(ctx.guild.id):
+            await ctx.send("❌ Raid mode is not on.")
+            return
+        await ctx.send("✅ Raid mode ended.")
+
+async def setup(bot):
+    await bot.add_cog(Protection(bot))
@@ -0,0 +1,63 @@
+"""Utility commands"""
+import discord
+from discord.ext import commands
+from datetime import datetime, timedelta
+
+from bot import (
+    cancel_temp_role, parse_time, schedule_temp_role,
+)
+
+class Utility(commands.Cog):
+    """Utility commands"""
+    
+    def __init__(self, bot):
+        self.bot = bot
+    
+    @commands.command()
+    @commands.has_permissions(manage_messages=True)
+    async def say(self, ctx, *, message):
+        """Make the bot say something"""
+        await ctx.message.delete()
+        await ctx.send(message)
+    
+    @commands.command()
+    @commands.has_permissions(manage_roles=True)
+    async def temprole(self, ctx, member: discord.Member, role: discord.Role, duration: str):
+        """Give a temporary role"""
+        seconds = parse_time(duration)
+        if not seconds:
+            await ctx.send("❌ Invalid time format. Use: 10m, 1h, 1d")
+            return
+        
+        try:
+            await member.add_roles(role, reason=f"Temporary role by {ctx.author}")
+            
+            expires = datetime.now() + timedelta(seconds=seconds)
+            schedule_temp_role(ctx.guild.id, member.id, role.id, expires)
+            
+            embed = discord.Embed(title="Temporary Role Added", color=0x00ff00)
+            embed.add_field(name="User", value=member.mention, inline=True)
+            embed.add_field(name="Role", value=role.mention, inline=True)
+            embed.add_field(name="Duration", value=duration, inline=True)
+            
+            await ctx.send(embed=embed)
+            
+        except discord.Forbidden:
+            await ctx.send("❌ I don't have permission to manage this role.")
+    
+    @commands.command()
+    @commands.has_permissions(manage_roles=True)
+    async def untemprole(self, ctx, member: discord.Member, role: discord.Role):
+        """Remove a temporary role before it expires"""
+        if not cancel_temp_role(ctx.guild.id, member.id, role.id):
+            await ctx.send(f"❌ {member} has no temporary {role.name} role.")
+            return
+        
+        try:
+            await member.remove_roles(role, reason=f"Temporary role removed by {ctx.author}")
+            await ctx.send(f"✅ Removed temporary role {role.mention} from {member.mention}")
+        except discord.Forbidden:
+            await ctx.send("❌ I don't have permission to manage this role.")
+
+async def setup(bot):
+    await bot.add_cog(Utility(bot))